@@ -1,29 +1,49 @@
 from flask import Flask, request, jsonify, render_template
-import pickle
+import io
 import numpy as np
+import pandas as pd
 import os
+import time
+
+import catalog
+import forest_engine
+import metrics
+import shared_models
+import sweep
+import validation
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache
 
 app = Flask(__name__)
 
-# Load Models
-def load_models():
-    models = {}
-    try:
-        with open('models/crop_model.pkl', 'rb') as f:
-            models['crop'] = pickle.load(f)
-        with open('models/crop_label_encoder.pkl', 'rb') as f:
-            models['crop_le'] = pickle.load(f)
-        with open('models/fertilizer_model.pkl', 'rb') as f:
-            models['fert'] = pickle.load(f)
-        with open('models/fertilizer_label_encoder.pkl', 'rb') as f:
-            models['fert_le'] = pickle.load(f)
-        with open('models/input_encoders.pkl', 'rb') as f:
-            models['input_les'] = pickle.load(f)
-    except Exception as e:
-        print(f"Error loading models: {e}")
-    return models
+# Load Models (forests are flattened so requests skip sklearn's per-call overhead). The registry
+# watches models/ and swaps in a retrained, verified version without a restart; a broken
+# artifact at startup fails loudly instead of serving with missing models.
+MODEL_POLL_SECONDS = float(os.environ.get('AGRIVISION_MODEL_POLL_SECONDS', 2))
+# Required in the X-Admin-Token header of /admin/* when set; otherwise only local callers are accepted
+ADMIN_TOKEN = os.environ.get('AGRIVISION_ADMIN_TOKEN')
+
+# Forests to serve through precompiled decision tables (e.g. "fert" or "crop,fert"); exact, and faster
+DECISION_TABLES = [key for key in os.environ.get('AGRIVISION_DECISION_TABLES', '').split(',') if key]
+# Forests to serve through their distilled surrogates (train_models.py --distill), e.g. "crop,fert".
+# Rows where the surrogate's confidence is below the threshold (default: calibrated at training) use the forest
+SURROGATES = [key for key in os.environ.get('AGRIVISION_SURROGATES', '').split(',') if key]
+SURROGATE_THRESHOLD = os.environ.get('AGRIVISION_SURROGATE_THRESHOLD')
+SURROGATE_THRESHOLD = None if SURROGATE_THRESHOLD is None else float(SURROGATE_THRESHOLD)
+# Batches of at least this many rows are scored by the sklearn forest, unpickled on the first one
+# (0 = always the flat walk, which keeps sklearn out of the worker's memory)
+LARGE_BATCH_ROWS = int(os.environ.get('AGRIVISION_LARGE_BATCH_ROWS', forest_engine.LARGE_BATCH_ROWS))
+# Under gunicorn.conf.py the master has already published the models in shared memory; workers
+# attach to that one copy instead of loading their own
+SHARED_MODELS = os.environ.get(shared_models.SEGMENT_ENV)
 
-models = load_models()
+if SHARED_MODELS:
+    registry = ModelRegistry('models', MODEL_POLL_SECONDS, *shared_models.attach(SHARED_MODELS),
+                             decision_tables=DECISION_TABLES, surrogates=SURROGATES,
+                             surrogate_threshold=SURROGATE_THRESHOLD, large_batch_rows=LARGE_BATCH_ROWS)
+else:
+    registry = ModelRegistry('models', MODEL_POLL_SECONDS, decision_tables=DECISION_TABLES, surrogates=SURROGATES,
+                             surrogate_threshold=SURROGATE_THRESHOLD, large_batch_rows=LARGE_BATCH_ROWS)
 
 @app.route('/')
 def index():
@@ -37,275 +57,333 @@ def crop():
 def fertilizer():
     return render_template('fertilizer.html')
 
+CROP_FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+FERT_FEATURES = ['Temperature', 'Humidity', 'Moisture', 'Soil Type', 'Crop Type', 'Nitrogen', 'Potassium', 'Phosphorous']
+
+# Upper bound on records accepted by a single batch request
+MAX_BATCH_SIZE = 50000
+
+# Response cache. Keys are the exact readings by default, so a cached response is always the one the
+# request would get uncached. AGRIVISION_CACHE_DECIMALS rounds numeric readings to that many decimals
+# for more hits, at the cost of near-identical readings sharing the first one's prediction and details
+CACHE_SIZE = int(os.environ.get('AGRIVISION_CACHE_SIZE', 10000))
+CACHE_TTL = float(os.environ.get('AGRIVISION_CACHE_TTL', 300))
+CACHE_DECIMALS = os.environ.get('AGRIVISION_CACHE_DECIMALS')
+CACHE_ROUNDING = None if not CACHE_DECIMALS else dict.fromkeys(
+    ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall',
+     'Temperature', 'Humidity', 'Moisture', 'Nitrogen', 'Potassium', 'Phosphorous'], int(CACHE_DECIMALS))
+
+# Entries are keyed by model version as well, and dropped as soon as a new version is active
+crop_cache = PredictionCache(CROP_FEATURES, CACHE_SIZE, CACHE_TTL, CACHE_ROUNDING, lambda: registry.version, 0)
+fert_cache = PredictionCache(FERT_FEATURES, CACHE_SIZE, CACHE_TTL, CACHE_ROUNDING, lambda: registry.version, 0)
+
 @app.route('/predict-crop', methods=['POST'])
 def predict_crop():
-    try:
-        data = request.json
-        
-        # Validation
-        validate_input(data, 'crop')
-
-        features = [
-            data['N'], data['P'], data['K'], 
-            data['temperature'], data['humidity'], data['ph'], data['rainfall']
-        ]
-        
-        prediction = models['crop'].predict([features])
-        predicted_crop = models['crop_le'].inverse_transform(prediction)[0]
-        
-        # Generate detailed info
-        info = get_crop_details(predicted_crop, data)
-        
-        return jsonify({
-            'prediction': predicted_crop,
-            'description': info['desc'],
-            'yield_outcome': info['yield'],
-            'link': info['link']
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)})
+    return serve_prediction('crop', predict_crop_batch)
 
 @app.route('/predict-fertilizer', methods=['POST'])
 def predict_fertilizer():
+    return serve_prediction('fertilizer', predict_fertilizer_batch)
+
+# Per endpoint, the schema used to parse numeric CSV columns
+SCHEMAS = {'crop': validation.CROP_SCHEMA, 'fertilizer': validation.FERTILIZER_SCHEMA}
+
+def serve_prediction(endpoint, predict_batch):
+    # Errors stay HTTP 200 with an 'error' field; they are counted by kind in /metrics
+    start = time.perf_counter()
+    profiler = metrics.start_profiler(request.args.get('profile') == '1')
+    try:
+        data = request_payload(SCHEMAS[endpoint])
+        top_k = parse_top_k(request.args.get('top_k'))
+
+        # A JSON list or CSV upload switches the endpoint into batch mode
+        if isinstance(data, list):
+            check_batch_size(data)
+            results, violations = predict_batch(data, top_k)
+            body = {'results': results, 'errors': violations}
+        else:
+            body = predict_batch([data], top_k)[0][0]
+            if 'error' in body:
+                metrics.REQUEST_ERRORS.inc(endpoint, 'validation')
+    except Exception as e:
+        metrics.REQUEST_ERRORS.inc(endpoint, metrics.error_kind(e))
+        body = {'error': str(e)}
+
+    if profiler is not None:
+        body = dict(body, profile=profiler.stop())
+    metrics.REQUESTS.inc(endpoint)
+    metrics.REQUEST_SECONDS.observe(endpoint, value=time.perf_counter() - start)
+    return jsonify(body)
+
+@app.route('/sweep-crop', methods=['POST'])
+def sweep_crop():
+    return serve_sweep('crop')
+
+@app.route('/sweep-fertilizer', methods=['POST'])
+def sweep_fertilizer():
+    return serve_sweep('fertilizer')
+
+def serve_sweep(kind):
+    # What-if grid around one base record, scored in a single predict_proba call
+    endpoint = f'sweep-{kind}'
+    start = time.perf_counter()
     try:
         data = request.json
-        
-        # Validation
-        validate_input(data, 'fertilizer')
-
-        soil_type = models['input_les']['soil'].transform([data['Soil Type']])[0]
-        crop_type = models['input_les']['crop'].transform([data['Crop Type']])[0]
-        
-        features = [
-            data['Temperature'], data['Humidity'], data['Moisture'], 
-            soil_type, crop_type, 
-            data['Nitrogen'], data['Potassium'], data['Phosphorous']
-        ]
-        
-        prediction = models['fert'].predict([features])
-        predicted_fert = models['fert_le'].inverse_transform(prediction)[0]
-        
-        # Generate detailed info
-        info = get_fertilizer_details(predicted_fert, data)
-        
-        return jsonify({
-            'prediction': predicted_fert,
-            'description': info['desc'],
-            'yield_outcome': info['yield'],
-            'link': info['link']
-        })
+        if not isinstance(data, dict) or not isinstance(data.get('base'), dict):
+            raise ValueError("Send {'base': {...record...}, 'sweep': [{'field', 'start', 'stop', 'steps'}, ...]}.")
+        base = data['base']
+        models = registry.current
+
+        if kind == 'crop':
+            schema, columns, choices = validation.CROP_SCHEMA, CROP_FEATURES, None
+            model, label_encoder = models['crop'], models['crop_le']
+        else:
+            schema, columns, choices = validation.FERTILIZER_SCHEMA, FERT_FEATURES, fertilizer_choices(models)
+            model, label_encoder = models['fert'], models['fert_le']
+        validation.validate_record(schema, base, choices)
+        axes = sweep.parse_axes(data.get('sweep'), base, schema)
+
+        row = dict(base)
+        if kind == 'fertilizer':
+            row['Soil Type'] = choices['Soil Type'].encode(base['Soil Type'])
+            row['Crop Type'] = choices['Crop Type'].encode(base['Crop Type'])
+        matrix = sweep.grid([row[name] for name in columns], columns, axes)
+
+        proba = model.predict_proba(matrix)
+        best = proba.argmax(axis=1)
+        labels = label_encoder.inverse_transform(model.classes_.take(best))
+        body = sweep.summarize(axes, labels, proba[np.arange(len(best)), best], bool(data.get('surface')))
+        body['model_version'] = models.version
     except Exception as e:
-        return jsonify({'error': str(e)})
-
-def validate_input(data, form_type):
-    # Common checks
-    if 'temperature' in data and (data['temperature'] > 60 or data['temperature'] < -10):
-        raise ValueError(f"🌡️ Temperature {data['temperature']}°C is too extreme for agriculture! Most crops die above 50°C.")
-    if 'Temperature' in data and (data['Temperature'] > 60 or data['Temperature'] < -10):
-         raise ValueError(f"🌡️ Temperature {data['Temperature']}°C is too extreme for agriculture! Most crops die above 50°C.")
-
-    if 'humidity' in data and (data['humidity'] < 0 or data['humidity'] > 100):
-        raise ValueError(f"💧 Humidity {data['humidity']}% is physically impossible. It must be between 0% and 100%.")
-    if 'Humidity' in data and (data['Humidity'] < 0 or data['Humidity'] > 100):
-        raise ValueError(f"💧 Humidity {data['Humidity']}% is physically impossible. It must be between 0% and 100%.")
-        
-    if 'ph' in data and (data['ph'] < 0 or data['ph'] > 14):
-        raise ValueError(f"🧪 pH {data['ph']} is chemically impossible! The scale ranges from 0 to 14.")
-        
-    # Crop specific
-    if form_type == 'crop':
-        if data['N'] > 200: raise ValueError("⚠️ Nitrogen levels over 200 are toxic to most plants.")
-        if data['P'] > 200: raise ValueError("⚠️ Phosphorous levels over 200 can lock up other nutrients.")
-        if data['K'] > 250: raise ValueError("⚠️ Potassium levels over 250 are unusually high.")
-        if data['rainfall'] < 0: raise ValueError("☔ Rainfall cannot be negative. Are you in a reverse dimension?")
-        
-    # Fertilizer specific
-    if form_type == 'fertilizer':
-        if data['Nitrogen'] > 200: raise ValueError("⚠️ Soil Nitrogen is already dangerously high.")
-        if data['moisture'] if 'moisture' in data else data.get('Moisture', 0) < 0:
-             raise ValueError("💧 Moisture cannot be negative.")
-
-def get_crop_details(crop, data):
-    # Dynamic analysis based on inputs
-    analysis = []
-    if data['N'] > 100: analysis.append("High Nitrogen levels detected.")
-    elif data['N'] < 20: analysis.append("Nitrogen levels are low.")
-    
-    if data['rainfall'] > 200: analysis.append("Heavy rainfall region suitable for water-intensive crops.")
-    elif data['rainfall'] < 50: analysis.append("Low rainfall region, drought-resistant qualities needed.")
-    
-    cond_str = " ".join(analysis) if analysis else "Soil and climate conditions are balanced."
-
-    details = {
-        'rice': {
-            'desc': f"Rice is a staple food crop. {cond_str} It thrives in these high-humidity conditions. Ensure standing water is maintained during the vegetative stage to suppress weeds and ensure optimal growth.",
-            'yield': 'Expected Yield: 4-5 tons/hectare under optimal management.',
-            'link': 'https://kare.fa.org/crops/rice' 
-        },
-        'maize': {
-            'desc': f"Maize is a versatile cereal crop. {cond_str} Your soil pH is suitable. Ensure proper drainage to prevent waterlogging, which maize is sensitive to.",
-            'yield': 'Expected Yield: 5-7 tons/hectare.',
-            'link': 'https://kare.fa.org/crops/maize'
-        },
-        'chickpea': {
-            'desc': f"Chickpea is a protein-rich pulse. {cond_str} It requires less water, making it perfect for your current moisture levels. Avoid excessive irrigation at flowering.",
-            'yield': 'Expected Yield: 1.5-2 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Chickpea'
-        },
-        'kidneybeans': {
-            'desc': f"Kidney beans require well-drained loamy soil. {cond_str} This crop fixes atmospheric nitrogen, improving your soil health for future rotations.",
-            'yield': 'Expected Yield: 1.2-1.5 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Kidney_bean'
-        },
-        'pigeonpeas': {
-            'desc': f"Pigeon peas are drought-tolerant. {cond_str} They have a deep root system that helps break hard soil pans. Excellent for intercropping.",
-            'yield': 'Expected Yield: 1-1.5 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Pigeon_pea'
-        },
-        'mothbeans': {
-            'desc': f"Moth beans are extremely drought-resistant. {cond_str} They provide great ground cover, preventing soil erosion in your field.",
-            'yield': 'Expected Yield: 0.5-0.8 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Vigna_aconitifolia'
-        },
-        'mungbean': {
-            'desc': f"Mungbean is a short-duration crop. {cond_str} It fits well in crop rotation. Ensure harvest is done before shattering of pods.",
-            'yield': 'Expected Yield: 1-1.2 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Mung_bean'
-        },
-        'blackgram': {
-            'desc': f"Blackgram improves soil fertility. {cond_str} It is sensitive to waterlogging, so ensure drainage is adequate given your rainfall.",
-            'yield': 'Expected Yield: 0.8-1.0 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Vigna_mungo'
-        },
-        'lentil': {
-            'desc': f"Lentils prefer cool climates. {cond_str} They are best sown after the rainy season. Requires minimal fertigation due to nitrogen fixation.",
-            'yield': 'Expected Yield: 1-1.5 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Lentil'
-        },
-        'pomegranate': {
-            'desc': f"Pomegranate is a high-value fruit crop. {cond_str} It requires regular irrigation but cannot tolerate standing water. Pruning is essential for quality fruit.",
-            'yield': 'Expected Yield: 10-12 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Pomegranate'
-        },
-        'banana': {
-            'desc': f"Banana is moisture-loving and requires high nutrients. {cond_str} Your high rainfall or irrigation capacity is key here. Protect from strong winds.",
-            'yield': 'Expected Yield: 30-40 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Banana'
-        },
-        'mango': {
-            'desc': f"Mango is the king of fruits. {cond_str} Deep, well-drained soil is ideal. Requires a dry spell during flowering for good fruit set.",
-            'yield': 'Expected Yield: 8-10 tons/hectare (after full establishment).',
-            'link': 'https://en.wikipedia.org/wiki/Mango'
-        },
-        'grapes': {
-            'desc': f"Grapes require careful pruning and training. {cond_str} They are sensitive to high humidity which causes diseases, so manage canopy air circulation well.",
-            'yield': 'Expected Yield: 20-25 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Grape'
-        },
-        'watermelon': {
-            'desc': f"Watermelon thrives in warm, dry climates. {cond_str} Sandy loam soil is best for root development. Requires frequent irrigation during early growth.",
-            'yield': 'Expected Yield: 25-30 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Watermelon'
-        },
-        'muskmelon': {
-            'desc': f"Muskmelon requires plenty of heat. {cond_str} High humidity can reduce sweetness, so ensure harvest is during dry weather.",
-            'yield': 'Expected Yield: 15-20 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Muskmelon'
-        },
-        'apple': {
-            'desc': f"Apples require chilling hours to fruit. {cond_str} Suitable for cooler high-altitude regions. Ensure pollinators like bees are present.",
-            'yield': 'Expected Yield: 10-15 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Apple'
-        },
-        'orange': {
-            'desc': f"Oranges need well-drained soil. {cond_str} They are sensitive to waterlogging. Regular micronutrient sprays will enhance fruit quality.",
-            'yield': 'Expected Yield: 15-20 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Orange_(fruit)'
-        },
-        'papaya': {
-            'desc': f"Papaya is a fast-growing fruit crop. {cond_str} Highly sensitive to frost and waterlogging. Provides quick returns compared to other orchards.",
-            'yield': 'Expected Yield: 40-50 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Papaya'
-        },
-        'coconut': {
-            'desc': f"Coconut thrives in humid coastal climates. {cond_str} Requires consistent moisture. Mulching is highly recommended to retain soil humidity.",
-            'yield': 'Expected Yield: 10,000-14,000 nuts/hectare/year.',
-            'link': 'https://en.wikipedia.org/wiki/Coconut'
-        },
-        'cotton': {
-            'desc': f"Cotton is a major fiber crop. {cond_str} Requires a long frost-free period. Pest management (bollworm) is critical for yield.",
-            'yield': 'Expected Yield: 2-3 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Cotton'
-        },
-        'jute': {
-            'desc': f"Jute requires a hot and humid climate. {cond_str} It is a rain-fed crop. Retting water availability is crucial for fiber extraction after harvest.",
-            'yield': 'Expected Yield: 2.5-3 tons/hectare.',
-            'link': 'https://en.wikipedia.org/wiki/Jute'
-        },
-        'coffee': {
-            'desc': f"Coffee grows well in shade. {cond_str} Acidic soil conditions are preferred. Requires pruning to maintain bush shape and facilitate picking.",
-            'yield': 'Expected Yield: 0.8-1.2 tons/hectare (clean coffee).',
-            'link': 'https://en.wikipedia.org/wiki/Coffee'
-        }
-    }
-    
-    # Default fallback
-    default = {
-        'desc': f"This crop is suitable for your provided conditions: {cond_str}. Ensure standard agricultural practices for your region.",
-        'yield': 'Yield varies based on management.',
-        'link': 'https://en.wikipedia.org/wiki/Agriculture'
-    }
-    
-    return details.get(crop, default)
-
-def get_fertilizer_details(fert, data):
-    analysis = f"Given your soil is {data.get('Soil Type', 'varied')} and you are growing {data.get('Crop Type', 'crops')},"
-    
-    details = {
-        'Urea': {
-            'desc': f"{analysis} your soil is highly deficient in Nitrogen. Urea provides 46% N, promoting vigorous leafy growth. Apply in split doses to reduce leaching losses.",
-            'yield': 'significantly improves vegetative growth.',
-            'link': 'https://en.wikipedia.org/wiki/Urea#Agriculture'
-        },
-        'DAP': {
-            'desc': f"{analysis} Di-Ammonium Phosphate supplies both N and high P. Essential for root development and early plant establishment. Best applied basally at sowing.",
-            'yield': 'Enhances root establishment and flowering.',
-            'link': 'https://en.wikipedia.org/wiki/Diammonium_phosphate'
-        },
-        '14-35-14': {
-            'desc': f"{analysis} this complex fertilizer provides balanced nutrition with high Phosphorus. Good for root crops and pulses initial growth stages.",
-            'yield': 'Balanced growth support.',
-            'link': 'https://en.wikipedia.org/wiki/Fertilizer'
-        },
-        '28-28': {
-            'desc': f"{analysis} this complex fertilizer provides equal high amounts of N and P. Suitable for top dressing in crops requiring vegetative and root boost.",
-            'yield': 'Boosts both foliage and root systems.',
-            'link': 'https://en.wikipedia.org/wiki/Fertilizer'
-        },
-        '17-17-17': {
-            'desc': f"{analysis} this is a balanced NPK fertilizer. It corrects general deficiencies in all three major nutrients, ensuring uniform crop health.",
-            'yield': 'Supports overall plant health and metabolic functions.',
-            'link': 'https://en.wikipedia.org/wiki/NPK_fertilizer'
-        },
-        '20-20': {
-            'desc': f"{analysis} supplies Nitrogen and Phosphorus. Often called Ammonium Phosphate Sulfate. Good for sulfur-loving crops like oilseeds if it contains S.",
-            'yield': 'Improves protein content and growth.',
-            'link': 'https://en.wikipedia.org/wiki/Fertilizer'
-        },
-        '10-26-26': {
-            'desc': f"{analysis} high in Phosphorus and Potassium. Ideal for flowering and fruiting stages, and for root crops like potatoes. Low Nitrogen prevents excessive vegetative growth.",
-            'yield': 'Maximizes fruit/grain quality and weight.',
-            'link': 'https://en.wikipedia.org/wiki/Fertilizer'
-        }
-    }
-    
-    default = {
-        'desc': f"{analysis} this fertilizer is recommended to balance your nutrient profile.",
-        'yield': 'Optimizes nutrient availability.',
-        'link': 'https://en.wikipedia.org/wiki/Fertilizer'
-    }
-    
-    return details.get(fert, default)
+        metrics.REQUEST_ERRORS.inc(endpoint, metrics.error_kind(e))
+        body = {'error': str(e)}
+
+    metrics.REQUESTS.inc(endpoint)
+    metrics.REQUEST_SECONDS.observe(endpoint, value=time.perf_counter() - start)
+    return jsonify(body)
+
+@app.route('/cache-stats')
+def cache_stats():
+    return jsonify({'crop': crop_cache.stats(), 'fertilizer': fert_cache.stats()})
+
+@app.route('/admin/models')
+def admin_models():
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(registry.status())
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    # Loads and verifies synchronously; the old version keeps serving if anything is wrong
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(registry.reload())
+
+def admin_allowed():
+    # Fails closed: without a token only a local caller of the debug server gets in
+    if ADMIN_TOKEN:
+        return request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+    return app.debug and request.remote_addr in ('127.0.0.1', '::1')
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+def cache_metrics():
+    # Cache statistics are read at scrape time rather than counted on the hot path
+    hits = metrics.Counter('agrivision_cache_hits_total', 'Response cache hits.', ['endpoint'])
+    misses = metrics.Counter('agrivision_cache_misses_total', 'Response cache misses.', ['endpoint'])
+    size = metrics.Gauge('agrivision_cache_entries', 'Entries held in the response cache.', ['endpoint'])
+    for endpoint, cache in (('crop', crop_cache), ('fertilizer', fert_cache)):
+        stats = cache.stats()
+        hits.inc(endpoint, amount=stats['hits'])
+        misses.inc(endpoint, amount=stats['misses'])
+        size.set(endpoint, value=stats['size'])
+    return [hits, misses, size]
+
+metrics.COLLECTORS.append(cache_metrics)
+
+def request_payload(schema):
+    # CSV arrives as a multipart 'file' field or a text/csv body
+    if 'file' in request.files:
+        return csv_records(request.files['file'], schema)
+    if request.mimetype == 'text/csv':
+        return csv_records(io.BytesIO(request.get_data()), schema)
+    return request.json
+
+def csv_records(source, schema):
+    # One record per CSV row; empty cells become missing fields. Numeric columns are parsed
+    # per cell, so a single bad cell rejects its own row rather than the whole column
+    frame = validation.coerce_numbers(schema, pd.read_csv(source))
+    return [
+        {name: value for name, value in record.items() if not pd.isna(value)}
+        for record in frame.to_dict('records')
+    ]
+
+def check_batch_size(records):
+    if not records:
+        raise ValueError("Batch is empty. Send at least one record.")
+    if len(records) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch of {len(records)} records exceeds the limit of {MAX_BATCH_SIZE}.")
+
+def parse_top_k(value):
+    # ?top_k=N adds the N most likely classes with their probabilities to each result
+    if value is None or value == '':
+        return None
+    try:
+        top_k = int(value)
+    except ValueError:
+        raise ValueError(f"top_k must be a positive integer, got {value!r}")
+    if top_k < 1:
+        raise ValueError(f"top_k must be a positive integer, got {value!r}")
+    return top_k
+
+def rank_predictions(model, label_encoder, features, top_k=None, clock=None):
+    # One predict_proba pass gives both the argmax label and the ranked runners-up
+    proba = model.predict_proba(features)
+    if clock is not None:
+        clock.lap('predict')
+    labels = label_encoder.inverse_transform(model.classes_.take(proba.argmax(axis=1)))
+    if not top_k:
+        if clock is not None:
+            clock.lap('inverse_transform')
+        return labels, None
+
+    # Stable sort keeps argmax's tie-breaking, so the first entry always equals the prediction
+    order = np.argsort(-proba, axis=1, kind='stable')[:, :top_k]
+    names = label_encoder.inverse_transform(model.classes_.take(order.ravel())).reshape(order.shape)
+    probabilities = np.take_along_axis(proba, order, axis=1)
+    rankings = [
+        [{'prediction': name, 'probability': p} for name, p in zip(row_names, row_probabilities)]
+        for row_names, row_probabilities in zip(names.tolist(), probabilities.tolist())
+    ]
+    if clock is not None:
+        clock.lap('inverse_transform')
+    return labels, rankings
+
+def reject_invalid(results, violations, choices=None):
+    # Each invalid row reports its first problem; the full list is returned alongside.
+    # Problems with a categorical field also carry the values that field accepts.
+    reported = []
+    for violation in violations:
+        entry = violation._asdict()
+        if choices and violation.field in choices:
+            entry['valid_values'] = list(choices[violation.field])
+        if results[violation.row] is None:
+            results[violation.row] = {key: entry[key] for key in ('error', 'valid_values') if key in entry}
+        reported.append(entry)
+    return reported
+
+def fertilizer_choices(models):
+    # Compiled lookups: constant-time, case/whitespace-insensitive, and used by validation too
+    lookups = models['input_lookups']
+    return {'Soil Type': lookups['soil'], 'Crop Type': lookups['crop']}
+
+def count_records(endpoint, total, valid_mask):
+    metrics.RECORDS.inc(endpoint, amount=total)
+    rejected = total - int(np.count_nonzero(valid_mask))
+    if rejected:
+        metrics.REJECTED_RECORDS.inc(endpoint, amount=rejected)
+
+def predict_crop_batch(records, top_k=None):
+    # Validate every record first, answer repeats from the cache, then run a single predict over the rest
+    clock = metrics.StageClock('crop')
+    models = registry.current
+    results = [None] * len(records)
+    valid_mask, violations = validation.check_records(validation.CROP_SCHEMA, records)
+    violations = reject_invalid(results, violations)
+    count_records('crop', len(records), valid_mask)
+    clock.lap('validation')
+
+    rows, valid, keys = [], [], []
+    for i in np.flatnonzero(valid_mask).tolist():
+        data = records[i]
+        key = crop_cache.key(data, top_k, models.version)
+        cached = crop_cache.get(key)
+        if cached is not None:
+            results[i] = dict(cached)
+            continue
+        rows.append([data[name] for name in CROP_FEATURES])
+        valid.append(i)
+        keys.append(key)
+
+    if rows:
+        features = np.array(rows, dtype=float)
+        clock.lap('features')
+        predicted_crops, rankings = rank_predictions(models['crop'], models['crop_le'], features, top_k, clock)
+
+        # Generate detailed info for the whole batch
+        infos = catalog.crop_details_batch(predicted_crops, features[:, 0], features[:, 6])
+        for n, (i, key, predicted_crop, info) in enumerate(zip(valid, keys, predicted_crops, infos)):
+            results[i] = {
+                'prediction': predicted_crop,
+                'description': info['desc'],
+                'yield_outcome': info['yield'],
+                'link': info['link'],
+                'model_version': models.version
+            }
+            if rankings:
+                results[i]['top_k'] = rankings[n]
+            crop_cache.put(key, results[i])
+        clock.lap('details')
+    return results, violations
+
+def predict_fertilizer_batch(records, top_k=None):
+    clock = metrics.StageClock('fertilizer')
+    models = registry.current
+    results = [None] * len(records)
+    choices = fertilizer_choices(models)
+    soil_lookup, crop_lookup = choices['Soil Type'], choices['Crop Type']
+    valid_mask, violations = validation.check_records(validation.FERTILIZER_SCHEMA, records, choices)
+    violations = reject_invalid(results, violations, choices)
+    count_records('fertilizer', len(records), valid_mask)
+    clock.lap('validation')
+
+    rows, soils, crops, valid, keys = [], [], [], [], []
+    for i in np.flatnonzero(valid_mask).tolist():
+        data = records[i]
+        key = fert_cache.key(data, top_k, models.version)
+        cached = fert_cache.get(key)
+        if cached is not None:
+            results[i] = dict(cached)
+            continue
+        rows.append([
+            data['Temperature'], data['Humidity'], data['Moisture'],
+            0, 0,
+            data['Nitrogen'], data['Potassium'], data['Phosphorous']
+        ])
+        soils.append(data['Soil Type'])
+        crops.append(data['Crop Type'])
+        valid.append(i)
+        keys.append(key)
+
+    if rows:
+        # Encode the categorical columns for all valid rows in one call each
+        features = np.array(rows, dtype=float)
+        soil_codes = soil_lookup.encode_many(soils)
+        crop_codes = crop_lookup.encode_many(crops)
+        features[:, 3] = soil_codes
+        features[:, 4] = crop_codes
+        clock.lap('features')
+
+        predicted_ferts, rankings = rank_predictions(models['fert'], models['fert_le'], features, top_k, clock)
+
+        # Details quote the canonical spelling ('Red', not ' red ')
+        infos = catalog.fertilizer_details_batch(predicted_ferts, soil_lookup.decode(soil_codes), crop_lookup.decode(crop_codes))
+        for n, (i, key, predicted_fert, info) in enumerate(zip(valid, keys, predicted_ferts, infos)):
+            results[i] = {
+                'prediction': predicted_fert,
+                'description': info['desc'],
+                'yield_outcome': info['yield'],
+                'link': info['link'],
+                'model_version': models.version
+            }
+            if rankings:
+                results[i]['top_k'] = rankings[n]
+            fert_cache.put(key, results[i])
+        clock.lap('details')
+    return results, violations
 
 if __name__ == '__main__':
     app.run(debug=True, port=5002)
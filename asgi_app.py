@@ -0,0 +1,206 @@
+"""Optional ASGI serving mode with micro-batching.
+
+Exposes the same /predict-crop and /predict-fertilizer contract as app.py.
+Concurrent single-record requests are held for at most BATCH_WAIT seconds (or
+until BATCH_SIZE of them arrive) and then scored together through the batch
+path in app.py, so one forest evaluation serves many callers.
+
+    uvicorn asgi_app:app --port 5002
+"""
+import asyncio
+import email.parser
+import email.policy
+import io
+import json
+import os
+import time
+from urllib.parse import parse_qs
+
+import app as flask_app
+import metrics
+
+BATCH_SIZE = int(os.environ.get('AGRIVISION_BATCH_SIZE', 64))
+BATCH_WAIT = float(os.environ.get('AGRIVISION_BATCH_WAIT_MS', 2)) / 1000
+
+
+class MicroBatcher:
+    def __init__(self, predict_batch, max_size=BATCH_SIZE, max_wait=BATCH_WAIT):
+        self.predict_batch = predict_batch
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.pending = {}   # top_k -> [(record, future)]; each top_k variant is batched separately
+        self.size = 0
+        self.timer = None
+        self.tasks = set()  # Running batches, held so the loop cannot garbage-collect them mid-flight
+        self.requests = 0
+        self.batches = 0
+        self.largest = 0
+
+    async def submit(self, record, top_k=None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.setdefault(top_k, []).append((record, future))
+        self.size += 1
+        if self.size >= self.max_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        pending, self.pending, self.size = self.pending, {}, 0
+        for top_k, batch in pending.items():
+            task = asyncio.ensure_future(self.run(batch, top_k))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self, batch, top_k):
+        self.requests += len(batch)
+        self.batches += 1
+        self.largest = max(self.largest, len(batch))
+        records = [record for record, _ in batch]
+        try:
+            # Inference runs in a thread so the loop keeps collecting the next window
+            results, _ = await asyncio.get_running_loop().run_in_executor(
+                None, self.predict_batch, records, top_k)
+        except Exception as e:
+            results = [{'error': str(e)}] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest,
+            'max_batch_size': self.max_size,
+            'max_wait_ms': self.max_wait * 1000,
+        }
+
+
+batchers = {
+    '/predict-crop': MicroBatcher(flask_app.predict_crop_batch),
+    '/predict-fertilizer': MicroBatcher(flask_app.predict_fertilizer_batch),
+}
+ENDPOINTS = {'/predict-crop': 'crop', '/predict-fertilizer': 'fertilizer'}
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_body(send, body, content_type, status=200):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200):
+    await send_body(send, json.dumps(payload, sort_keys=True).encode(), b'application/json', status)
+
+
+def multipart_file(content_type, body):
+    # The 'file' field of a multipart/form-data upload, as app.py reads request.files['file']
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type + b'\r\n\r\n' + body)
+    for part in message.iter_parts():
+        if part.get_param('name', header='content-disposition') == 'file':
+            return io.BytesIO(part.get_payload(decode=True))
+    raise ValueError("A multipart upload must carry the CSV in a 'file' field")
+
+
+async def predict(path, query, headers, body):
+    batcher = batchers[path]
+    endpoint = ENDPOINTS[path]
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        top_k = flask_app.parse_top_k(parse_qs(query).get('top_k', [None])[-1])
+        content_type = headers.get(b'content-type', b'')
+        mimetype = content_type.split(b';')[0].strip()
+        if mimetype == b'text/csv':
+            data = await loop.run_in_executor(None, flask_app.csv_records, io.BytesIO(body),
+                                              flask_app.SCHEMAS[endpoint])
+        elif mimetype == b'multipart/form-data':
+            data = await loop.run_in_executor(None, flask_app.csv_records, multipart_file(content_type, body),
+                                              flask_app.SCHEMAS[endpoint])
+        else:
+            data = json.loads(body)
+
+        # Lists are already a batch; score them directly like the Flask endpoints do
+        if isinstance(data, list):
+            flask_app.check_batch_size(data)
+            results, violations = await loop.run_in_executor(None, batcher.predict_batch, data, top_k)
+            return {'results': results, 'errors': violations}
+
+        result = await batcher.submit(data, top_k)
+        if 'error' in result:
+            metrics.REQUEST_ERRORS.inc(endpoint, 'validation')
+        return result
+    except Exception as e:
+        metrics.REQUEST_ERRORS.inc(endpoint, metrics.error_kind(e))
+        return {'error': str(e)}
+    finally:
+        metrics.REQUESTS.inc(endpoint)
+        metrics.REQUEST_SECONDS.observe(endpoint, value=time.perf_counter() - start)
+
+
+def admin_allowed(scope):
+    # Same rule as the Flask app: the admin token when configured, otherwise local callers in debug mode only
+    if flask_app.ADMIN_TOKEN:
+        return dict(scope['headers']).get(b'x-admin-token', b'').decode() == flask_app.ADMIN_TOKEN
+    return flask_app.app.debug and (scope.get('client') or ('',))[0] in ('127.0.0.1', '::1')
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    path, method = scope['path'], scope['method']
+    body = await read_body(receive)
+    if path in batchers and method == 'POST':
+        query = scope.get('query_string', b'').decode('latin-1')
+        await send_json(send, await predict(path, query, dict(scope['headers']), body))
+    elif path == '/batch-stats' and method == 'GET':
+        await send_json(send, {'crop': batchers['/predict-crop'].stats(),
+                               'fertilizer': batchers['/predict-fertilizer'].stats()})
+    elif path == '/cache-stats' and method == 'GET':
+        await send_json(send, {'crop': flask_app.crop_cache.stats(), 'fertilizer': flask_app.fert_cache.stats()})
+    elif path in ('/admin/models', '/admin/reload'):
+        if not admin_allowed(scope):
+            await send_json(send, {'error': 'Forbidden'}, status=403)
+        elif path == '/admin/reload' and method == 'POST':
+            loop = asyncio.get_running_loop()
+            await send_json(send, await loop.run_in_executor(None, flask_app.registry.reload))
+        else:
+            await send_json(send, flask_app.registry.status())
+    elif path == '/metrics' and method == 'GET':
+        await send_body(send, metrics.render().encode(), b'text/plain; version=0.0.4; charset=utf-8')
+    else:
+        await send_json(send, {'error': 'Not found'}, status=404)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('asgi_app:app', port=5002)
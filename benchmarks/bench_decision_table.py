@@ -0,0 +1,83 @@
+"""Parity, memory and latency of DecisionTable against the FlatForest it is built from.
+
+Run from the project root:
+
+    python -m benchmarks.bench_decision_table
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import data_generator
+from benchmarks.bench_forest_engine import latency, load_inputs, throughput
+from decision_table import DecisionTable
+from forest_engine import ARRAYS
+from model_registry import load_models
+
+
+def parity_inputs(name, X, models, rng, generated):
+    # CSV rows, jittered copies near the thresholds, fresh generator samples, values outside the
+    # training ranges, and rows with NaN/inf (which take the tree-walk fallback)
+    if name == 'crop':
+        samples = next(data_generator.crop_chunks(generated, rng)).drop(columns='label')
+    else:
+        samples = next(data_generator.fertilizer_chunks(generated, rng)).drop(columns='Fertilizer Name')
+        for key, field in (('soil', 'Soil Type'), ('crop', 'Crop Type')):
+            samples[field] = models['input_lookups'][key].encode_many(samples[field].tolist())
+    low, high = X.min(axis=0), X.max(axis=0)
+    outside = rng.uniform(low - (high - low), high + (high - low), size=(1000, X.shape[1]))
+    broken = X[:4].copy()
+    broken[0, 0], broken[1, -1], broken[2, 1], broken[3] = np.nan, np.inf, -np.inf, np.nan
+    return {
+        'csv': X,
+        'jittered': X + rng.normal(0, 0.5, size=X.shape),
+        'generated': samples.to_numpy(dtype=float),
+        'outside': outside,
+        'non-finite': broken,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=300, help='single-row predictions per model')
+    parser.add_argument('--generated', type=int, default=20000, help='generator samples in the parity check')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    inputs = load_inputs()
+    models = load_models()
+    failed = False
+
+    for name, key in (('crop', 'crop'), ('fertilizer', 'fert')):
+        forest = models[key]
+        start = time.perf_counter()
+        table = DecisionTable.compile(forest)
+        build = time.perf_counter() - start
+        X = inputs[name]
+
+        mismatches = [
+            part for part, data in parity_inputs(name, X, models, rng, args.generated).items()
+            if not np.array_equal(forest.predict_proba(data), table.predict_proba(data))
+        ]
+        print(f"[{name}] parity: {'FAILED on ' + ', '.join(mismatches) if mismatches else 'ok'}")
+        failed = failed or bool(mismatches)
+
+        forest_bytes = sum(getattr(forest, array).nbytes for array in ARRAYS)
+        bins = sum(len(edges) + 1 for edges in table.thresholds)
+        print(f"[{name}] build {build * 1000:.0f} ms; {bins} bins x {table.n_estimators} trees x {table.words} words: "
+              f"{table.nbytes / 1e6:.2f} MB on top of the forest's {forest_bytes / 1e6:.2f} MB")
+
+        ff_p50, ff_p99 = latency(forest.predict_proba, X, args.repeats)
+        dt_p50, dt_p99 = latency(table.predict_proba, X, args.repeats)
+        ff_rate, dt_rate = throughput(forest.predict_proba, X), throughput(table.predict_proba, X)
+        print(f"[{name}] single row  forest p50 {ff_p50:.3f} ms  p99 {ff_p99:.3f} ms")
+        print(f"[{name}] single row  table  p50 {dt_p50:.3f} ms  p99 {dt_p99:.3f} ms  ({ff_p50 / dt_p50:.1f}x p50)")
+        print(f"[{name}] batch       forest {ff_rate:,.0f} rows/s  table {dt_rate:,.0f} rows/s  ({dt_rate / ff_rate:.1f}x)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Parity check and latency comparison between sklearn and FlatForest.
+
+Run from the project root:
+
+    python -m benchmarks.bench_forest_engine
+"""
+import argparse
+import pickle
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from forest_engine import FlatForest
+
+
+def load_inputs():
+    crop_X = pd.read_csv('crop_recommendation.csv').drop('label', axis=1).to_numpy(dtype=float)
+
+    df = pd.read_csv('fertilizer_recommendation.csv')
+    with open('models/input_encoders.pkl', 'rb') as f:
+        les = pickle.load(f)
+    df['Soil Type'] = les['soil'].transform(df['Soil Type'])
+    df['Crop Type'] = les['crop'].transform(df['Crop Type'])
+    fert_X = df.drop('Fertilizer Name', axis=1).to_numpy(dtype=float)
+    return {'crop': crop_X, 'fertilizer': fert_X}
+
+
+def check_parity(model, engine, X, rng):
+    # The CSV rows plus jittered copies so that many rows land near split thresholds
+    jittered = X + rng.normal(0, 0.5, size=X.shape)
+    for name, data in (('csv', X), ('jittered', jittered)):
+        expected_proba = model.predict_proba(data)
+        actual_proba = engine.predict_proba(data)
+        if not np.array_equal(expected_proba, actual_proba):
+            diff = np.abs(expected_proba - actual_proba).max()
+            return f"predict_proba mismatch on {name} rows (max abs diff {diff:.3g})"
+        if not np.array_equal(model.predict(data), engine.predict(data)):
+            return f"predict mismatch on {name} rows"
+    return None
+
+
+def latency(fn, X, repeats):
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        row = X[i % len(X)].reshape(1, -1)
+        start = time.perf_counter()
+        fn(row)
+        timings[i] = time.perf_counter() - start
+    return np.percentile(timings, [50, 99]) * 1000
+
+
+def throughput(fn, X):
+    start = time.perf_counter()
+    fn(X)
+    return len(X) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=300, help='single-row predictions per model')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    rng = np.random.default_rng(0)
+    inputs = load_inputs()
+    failed = False
+
+    for name, path in (('crop', 'models/crop_model.pkl'), ('fertilizer', 'models/fertilizer_model.pkl')):
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+        engine = FlatForest.from_sklearn(model)
+        X = inputs[name]
+
+        error = check_parity(model, engine, X, rng)
+        print(f"[{name}] parity: {'FAILED - ' + error if error else 'ok'} ({len(X)} rows)")
+        failed = failed or error is not None
+
+        sk_p50, sk_p99 = latency(model.predict, X, args.repeats)
+        ff_p50, ff_p99 = latency(engine.predict, X, args.repeats)
+        print(f"[{name}] single row  sklearn p50 {sk_p50:.3f} ms  p99 {sk_p99:.3f} ms")
+        print(f"[{name}] single row  flat    p50 {ff_p50:.3f} ms  p99 {ff_p99:.3f} ms  ({sk_p99 / ff_p99:.1f}x p99)")
+        print(f"[{name}] batch       sklearn {throughput(model.predict, X):,.0f} rows/s"
+              f"  flat {throughput(engine.predict, X):,.0f} rows/s")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Per-worker memory with private, memory-mapped and shared-memory model copies.
+
+Forks --workers processes per mode, the way gunicorn does. Each worker loads
+the models, scores the CSV rows so every forest page is touched, and then
+reports its memory from /proc/self/smaps_rollup while all workers of the mode
+are still alive. PSS splits shared pages between the processes mapping them,
+so summing PSS over the workers gives their real combined footprint. Linux
+only. Run from the project root:
+
+    python -m benchmarks.bench_shared_memory --workers 4
+
+Modes:
+    pickle  every worker unpickles the sklearn forests into private arrays
+    mmap    every worker maps the compact export (models/*_forest) read-only
+    shared  the parent publishes once and workers attach (shared_models)
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+import metrics
+import shared_models
+from model_registry import FORESTS, ModelRegistry, load_models
+
+MB = 1024 * 1024
+KINDS = ('rss', 'pss', 'shared', 'private')
+
+
+def pickle_only_directory(directory):
+    # Same artifacts minus the compact exports, so the registry falls back to the pickles
+    target = tempfile.mkdtemp(prefix='agrivision-pickles-')
+    compact = {compact_name for compact_name, _ in FORESTS.values()}
+    for name in os.listdir(directory):
+        if name not in compact:
+            os.symlink(os.path.abspath(os.path.join(directory, name)), os.path.join(target, name))
+    return target
+
+
+def worker(mode, directory, segment_name, inputs, barrier, results):
+    # Every batch stays on the flat walk, so no worker unpickles the sklearn forests for large batches
+    if mode == 'shared':
+        registry = ModelRegistry(directory, 0, *shared_models.attach(segment_name), large_batch_rows=None)
+    else:
+        registry = ModelRegistry(directory, 0, large_batch_rows=None)
+    models = registry.current
+    models['crop'].predict_proba(inputs['crop'])
+    models['fert'].predict_proba(inputs['fert'])
+    # Measure only once every worker has loaded, so shared pages are split between all of them
+    barrier.wait()
+    results.put(metrics.process_memory())
+    barrier.wait()
+
+
+def measure(mode, directory, n_workers, inputs, segment_name=None):
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(n_workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, directory, segment_name, inputs, barrier, results))
+                 for _ in range(n_workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            raise RuntimeError(f"{mode} worker exited with status {process.exitcode}")
+    return {kind: [report[kind] for report in reports] for kind in KINDS}
+
+
+def load_inputs():
+    import pandas as pd
+    from encoders import CategoryLookup
+    crop = pd.read_csv('crop_recommendation.csv').drop(columns='label').to_numpy(dtype=float)
+    fert = pd.read_csv('fertilizer_recommendation.csv').drop(columns='Fertilizer Name')
+    for field in ('Soil Type', 'Crop Type'):
+        fert[field] = CategoryLookup.fit(field, fert[field]).encode_many(fert[field].tolist())
+    return {'crop': crop, 'fert': fert.to_numpy(dtype=float)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-worker memory of private vs shared model copies.")
+    parser.add_argument('--workers', type=int, default=4, help='worker processes per mode (default 4)')
+    parser.add_argument('--models', default='models', help='models directory (default models/)')
+    args = parser.parse_args()
+
+    if not metrics.process_memory():
+        print("Memory accounting needs /proc/self/smaps_rollup (Linux).")
+        return 1
+
+    inputs = load_inputs()
+    # Import everything loading pulls in (sklearn, via the pickled encoders) before forking, so every
+    # mode forks from the same parent and only the model copies differ
+    load_models(args.models)
+    modes = {}
+    pickles = pickle_only_directory(args.models)
+    try:
+        modes['pickle'] = measure('pickle', pickles, args.workers, inputs)
+    finally:
+        shutil.rmtree(pickles)
+    if all(os.path.exists(os.path.join(args.models, name, 'manifest.json')) for name, _ in FORESTS.values()):
+        modes['mmap'] = measure('mmap', args.models, args.workers, inputs)
+    segment = shared_models.publish(args.models)
+    try:
+        modes['shared'] = measure('shared', args.models, args.workers, inputs, segment.name)
+    finally:
+        segment.close()
+        segment.unlink()
+
+    print(f"{args.workers} workers per mode; shared segment {segment.size / MB:.1f} MB. Per-worker means in MB:")
+    print(f"{'mode':8} {'rss':>8} {'pss':>8} {'shared':>8} {'private':>8} {'total pss':>10}")
+    for mode, usage in modes.items():
+        means = {kind: np.mean(values) / MB for kind, values in usage.items()}
+        print(f"{mode:8} {means['rss']:8.1f} {means['pss']:8.1f} {means['shared']:8.1f} {means['private']:8.1f} "
+              f"{sum(usage['pss']) / MB:10.1f}")
+
+    baseline = modes['pickle']
+    for mode in [m for m in modes if m != 'pickle']:
+        private = (np.mean(baseline['private']) - np.mean(modes[mode]['private'])) / MB
+        pss = (sum(baseline['pss']) - sum(modes[mode]['pss'])) / MB
+        print(f"{mode} vs pickle: {private:.1f} MB less private memory per worker, {pss:.1f} MB less in total")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Concurrent load generator for the prediction endpoints.
+
+Fires single-record requests from many client threads and reports throughput
+and p50/p99 latency per target. With --spawn it starts the Flask server and the
+micro-batching ASGI server (uvicorn) locally and compares the two:
+
+    python -m benchmarks.load_test --spawn
+    python -m benchmarks.load_test --target flask=http://127.0.0.1:5002
+"""
+import argparse
+import http.client
+import json
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+SERVERS = {
+    'flask': [sys.executable, '-c', "import app; app.app.run(port={port}, threaded=True)"],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--port', '{port}', '--log-level', 'warning'],
+}
+
+
+def sample_payloads(endpoint, count):
+    if endpoint == 'crop':
+        frame = pd.read_csv('crop_recommendation.csv').drop('label', axis=1)
+    else:
+        frame = pd.read_csv('fertilizer_recommendation.csv').drop('Fertilizer Name', axis=1)
+    # Jitter numeric readings so the response cache does not turn this into a cache benchmark
+    rng = np.random.default_rng(0)
+    rows = frame.sample(count, replace=True, random_state=0).reset_index(drop=True)
+    for column in rows.select_dtypes('number'):
+        rows[column] = (rows[column] * rng.uniform(0.98, 1.02, len(rows))).round(4)
+    return [json.dumps(record).encode() for record in rows.to_dict('records')]
+
+
+def run_load(url, endpoint, payloads, concurrency):
+    parts = urlsplit(url)
+    path = f'/predict-{endpoint}'
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    next_index = iter(range(len(payloads)))
+
+    def client():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        local = []
+        while True:
+            with lock:
+                i = next(next_index, None)
+            if i is None:
+                break
+            start = time.perf_counter()
+            try:
+                conn.request('POST', path, payloads[i], {'Content-Type': 'application/json'})
+                body = json.loads(conn.getresponse().read())
+                if 'prediction' not in body:
+                    errors.append(body.get('error'))
+            except Exception as e:
+                errors.append(str(e))
+                conn.close()
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return {'requests': len(latencies), 'errors': len(errors), 'seconds': elapsed,
+            'throughput': len(latencies) / elapsed, 'p50_ms': p50, 'p99_ms': p99}
+
+
+def wait_until_up(url, timeout=60):
+    parts = urlsplit(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=1)
+            conn.request('GET', '/cache-stats')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', action='append', default=[], metavar='NAME=URL',
+                        help='server to load (repeatable)')
+    parser.add_argument('--spawn', action='store_true', help='start flask and asgi servers locally')
+    parser.add_argument('--endpoint', choices=['crop', 'fertilizer'], default='crop')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    targets = dict(target.split('=', 1) for target in args.target)
+    processes = []
+    if args.spawn:
+        for port, (name, command) in enumerate(SERVERS.items(), start=5102):
+            command = [part.format(port=port) for part in command]
+            processes.append(subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            targets[name] = f'http://127.0.0.1:{port}'
+    if not targets:
+        parser.error('give at least one --target or use --spawn')
+
+    try:
+        payloads = sample_payloads(args.endpoint, args.requests)
+        print(f"{args.requests} requests to /predict-{args.endpoint}, {args.concurrency} concurrent clients")
+        for name, url in targets.items():
+            wait_until_up(url)
+            run_load(url, args.endpoint, payloads[:50], args.concurrency)  # warm up
+            r = run_load(url, args.endpoint, payloads, args.concurrency)
+            print(f"{name:<8} {r['throughput']:8.0f} req/s  p50 {r['p50_ms']:7.2f} ms  p99 {r['p99_ms']:7.2f} ms"
+                  f"  errors {r['errors']}")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
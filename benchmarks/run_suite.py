@@ -0,0 +1,224 @@
+"""Benchmark suite: cold start, predict latency/throughput, Flask request path and memory.
+
+Writes machine-readable JSON and compares it against a stored baseline; any
+metric that regresses beyond --tolerance is reported and the exit status is 1.
+Run from the project root:
+
+    python -m benchmarks.run_suite --save-baseline          # record benchmarks/baseline.json
+    python -m benchmarks.run_suite --output results.json    # later: measure and compare
+
+Cold start and peak RSS are measured in fresh worker processes, so they reflect
+what each server worker pays. The response cache is disabled throughout.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+os.environ['AGRIVISION_CACHE_SIZE'] = '0'
+os.environ['AGRIVISION_MODEL_POLL_SECONDS'] = '0'
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_BASELINE = os.path.join('benchmarks', 'baseline.json')
+# p99 metrics are allowed this multiple of --tolerance before they count as regressed
+TAIL_TOLERANCE_FACTOR = 2
+
+
+def record(results, name, value, unit, better='lower'):
+    # better says which direction is an improvement
+    results[name] = {'value': float(value), 'unit': unit, 'better': better}
+
+
+def sample_inputs(kind, rows, source, seed):
+    # Raw records (as the API receives them) drawn reproducibly from the CSVs or the generators
+    rng = np.random.default_rng(seed)
+    if source == 'generated':
+        import data_generator
+        chunks = data_generator.crop_chunks if kind == 'crop' else data_generator.fertilizer_chunks
+        # crop_chunks emits whole crops only, so ask for enough rows and trim
+        frame = pd.concat(chunks(rows + 22, rng))
+    else:
+        frame = pd.read_csv('crop_recommendation.csv' if kind == 'crop' else 'fertilizer_recommendation.csv')
+    frame = frame.drop(columns=['label', 'Fertilizer Name'], errors='ignore')
+    frame = frame.iloc[rng.integers(0, len(frame), rows)].reset_index(drop=True)
+    return frame.to_dict('records')
+
+
+def feature_matrix(app, kind, records):
+    if kind == 'crop':
+        return np.array([[r[name] for name in app.CROP_FEATURES] for r in records], dtype=float)
+    les = app.registry.current['input_les']
+    frame = pd.DataFrame(records, columns=app.FERT_FEATURES)
+    frame['Soil Type'] = les['soil'].transform(frame['Soil Type'])
+    frame['Crop Type'] = les['crop'].transform(frame['Crop Type'])
+    return frame.to_numpy(dtype=float)
+
+
+def percentiles(fn, items, repeats, rounds=3, warmup=20):
+    # p50/p99 per round, best of a few rounds: tail latency on a shared machine is noisy
+    for i in range(warmup):
+        fn(items[i % len(items)])
+    best = None
+    for _ in range(rounds):
+        timings = np.empty(repeats)
+        for i in range(repeats):
+            item = items[i % len(items)]
+            start = time.perf_counter()
+            fn(item)
+            timings[i] = time.perf_counter() - start
+        current = np.percentile(timings, [50, 99])
+        best = current if best is None else np.minimum(best, current)
+    return best
+
+
+def best_throughput(fn, X, rounds=3):
+    best = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(X)
+        best = max(best, len(X) / (time.perf_counter() - start))
+    return best
+
+
+def worker(args):
+    # Runs in a fresh interpreter: import app (which loads the models), serve a little traffic, report
+    start = time.perf_counter()
+    import app
+    import metrics
+    cold_start = time.perf_counter() - start
+    load_models = sum(metrics.MODEL_LOAD_SECONDS._values.values())
+
+    client = app.app.test_client()
+    for kind in ('crop', 'fertilizer'):
+        records = sample_inputs(kind, args.batch_rows, args.source, args.seed)
+        for record in records[:50]:
+            client.post(f'/predict-{kind}', json=record)
+        client.post(f'/predict-{kind}', json=records)
+
+    print(json.dumps({
+        'cold_start_s': cold_start,
+        'load_models_s': load_models,
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != 'darwin' else 1024 ** 2),
+    }))
+
+
+def run_workers(args, results):
+    command = [sys.executable, '-m', 'benchmarks.run_suite', '--worker',
+               '--source', args.source, '--seed', str(args.seed), '--batch-rows', str(args.batch_rows)]
+    runs = []
+    for _ in range(args.cold_starts):
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    record(results, 'cold_start.import_app_ms', np.median([r['cold_start_s'] for r in runs]) * 1000, 'ms')
+    record(results, 'cold_start.load_models_ms', np.median([r['load_models_s'] for r in runs]) * 1000, 'ms')
+    record(results, 'memory.worker_peak_rss_mb', max(r['peak_rss_mb'] for r in runs), 'MB')
+
+
+def run_in_process(args, results):
+    import app
+    client = app.app.test_client()
+
+    for kind, model_key in (('crop', 'crop'), ('fertilizer', 'fert')):
+        model = app.registry.current[model_key]
+        records = sample_inputs(kind, args.batch_rows, args.source, args.seed)
+        X = feature_matrix(app, kind, records)
+        rows = [X[i:i + 1] for i in range(min(len(X), args.repeats))]
+
+        p50, p99 = percentiles(model.predict, rows, args.repeats)
+        record(results, f'predict.{kind}.single_row_p50_us', p50 * 1e6, 'us')
+        record(results, f'predict.{kind}.single_row_p99_us', p99 * 1e6, 'us')
+        record(results, f'predict.{kind}.batch_rows_per_s', best_throughput(model.predict, X), 'rows/s', 'higher')
+
+        path = f'/predict-{kind}'
+        p50, p99 = percentiles(lambda record: client.post(path, json=record), records, args.repeats)
+        record(results, f'flask.{kind}.single_p50_ms', p50 * 1000, 'ms')
+        record(results, f'flask.{kind}.single_p99_ms', p99 * 1000, 'ms')
+        post_batch = lambda records: client.post(path, json=records)
+        record(results, f'flask.{kind}.batch_rows_per_s', best_throughput(post_batch, records), 'rows/s', 'higher')
+
+
+def compare(results, baseline, tolerance):
+    # Relative change against the baseline; only changes in the "worse" direction fail
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or previous['value'] == 0:
+            continue
+        change = current['value'] / previous['value'] - 1
+        allowed = tolerance * TAIL_TOLERANCE_FACTOR if '_p99_' in name else tolerance
+        worse = change > allowed if current['better'] == 'lower' else change < -allowed
+        flag = 'REGRESSION' if worse else ''
+        print(f"  {name:<40} {previous['value']:>12.3f} -> {current['value']:>12.3f} {current['unit']:<7}"
+              f" {change * 100:+7.1f}%  {flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', choices=['csv', 'generated'], default='csv',
+                        help='inputs from the bundled CSVs or from data_generator (default csv)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeats', type=int, default=500, help='single-row/request samples per measurement')
+    parser.add_argument('--batch-rows', type=int, default=10000)
+    parser.add_argument('--cold-starts', type=int, default=3, help='fresh worker processes to start')
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative change tolerated before a metric counts as regressed (default 0.25, doubled for p99)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args)
+
+    results = {}
+    run_workers(args, results)
+    run_in_process(args, results)
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {k: v for k, v in vars(args).items() if k in ('source', 'seed', 'repeats', 'batch_rows', 'cold_starts')},
+        'results': results,
+    }
+
+    for name, result in results.items():
+        print(f"  {name:<40} {result['value']:>12.3f} {result['unit']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {args.baseline} ({baseline['created_at']}, tolerance {args.tolerance:.0%}):")
+    regressions = compare(results, baseline['results'], args.tolerance)
+    if regressions:
+        print(f"\nFAILED: {len(regressions)} metric(s) regressed: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Offline bulk scoring for large CSV/Parquet survey files.
+
+The input is streamed in chunks. Each chunk is validated, encoded and predicted
+as one matrix, and its results are appended to the output before the next chunk
+is read, so memory stays flat however large the file is.
+
+    python bulk_score.py crop district_survey.csv scored.csv
+    python bulk_score.py fertilizer samples.parquet scored.parquet --workers 0
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import catalog
+import validation
+from chunked_io import ChunkWriter, read_chunks
+# One run scores every chunk with the same model version, so the registry does not watch for retrains
+os.environ.setdefault('AGRIVISION_MODEL_POLL_SECONDS', '0')
+# Importing app loads the models; pool workers inherit (or, with "spawn", re-map) the same models
+import app
+from app import CROP_FEATURES, FERT_FEATURES
+
+SCHEMAS = {'crop': validation.CROP_SCHEMA, 'fertilizer': validation.FERTILIZER_SCHEMA}
+MODEL_KEYS = {'crop': 'crop', 'fertilizer': 'fert'}
+
+
+def missing_columns(kind, frame):
+    return [field.name for field in SCHEMAS[kind] if field.name not in frame.columns]
+
+
+def score_frame(kind, frame, details=False):
+    models = app.registry.current
+    # A bad cell makes the reader type its whole column as text; parse per cell so only that row is rejected
+    frame = validation.coerce_numbers(SCHEMAS[kind], frame.reset_index(drop=True))
+    n_rows = len(frame)
+
+    if kind == 'crop':
+        valid, violations = validation.validate_frame(validation.CROP_SCHEMA, frame)
+        features = frame.loc[valid, CROP_FEATURES].to_numpy(dtype=float)
+        model, label_encoder = models['crop'], models['crop_le']
+    else:
+        choices = app.fertilizer_choices(models)
+        valid, violations = validation.validate_frame(validation.FERTILIZER_SCHEMA, frame, choices)
+        rows = frame.loc[valid, FERT_FEATURES]
+        features = rows.drop(columns=['Soil Type', 'Crop Type']).astype(float)
+        soil_codes = choices['Soil Type'].encode_many(rows['Soil Type'].tolist())
+        crop_codes = choices['Crop Type'].encode_many(rows['Crop Type'].tolist())
+        features.insert(3, 'Soil Type', soil_codes)
+        features.insert(4, 'Crop Type', crop_codes)
+        features = features.to_numpy(dtype=float)
+        model, label_encoder = models['fert'], models['fert_le']
+
+    # Numeric inputs go out as floats so every chunk has the same output schema
+    out = frame.copy()
+    for field in SCHEMAS[kind]:
+        if field.kind == 'number' and field.name in out.columns:
+            out[field.name] = pd.to_numeric(out[field.name], errors='coerce').astype(float)
+
+    predictions = np.full(n_rows, None, dtype=object)
+    if len(features):
+        predictions[valid] = label_encoder.inverse_transform(model.predict(features))
+    out['prediction'] = pd.array(predictions, dtype='string')
+
+    errors = np.full(n_rows, None, dtype=object)
+    for violation in reversed(violations):
+        # Reversed so each row keeps its first violation
+        errors[violation.row] = violation.error
+    out['error'] = pd.array(errors, dtype='string')
+
+    if details:
+        descriptions = np.full(n_rows, None, dtype=object)
+        if len(features):
+            if kind == 'crop':
+                infos = catalog.crop_details_batch(predictions[valid], features[:, 0], features[:, 6])
+            else:
+                infos = catalog.fertilizer_details_batch(predictions[valid], choices['Soil Type'].decode(soil_codes),
+                                                         choices['Crop Type'].decode(crop_codes))
+            descriptions[valid] = [info['desc'] for info in infos]
+        out['description'] = pd.array(descriptions, dtype='string')
+
+    return out, int(valid.sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file in chunks.")
+    parser.add_argument('kind', choices=sorted(SCHEMAS), help='which model to run')
+    parser.add_argument('input', help='input .csv or .parquet file')
+    parser.add_argument('output', help='output .csv or .parquet file')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='rows per chunk (default 50000)')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes; 0 = one per core (default 1)')
+    parser.add_argument('--details', action='store_true', help='add the description column')
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count()
+    # Required columns are checked on the first chunk, before any output is written
+    frames = read_chunks(args.input, args.chunk_size)
+    first = next(frames, None)
+    if first is not None:
+        missing = missing_columns(args.kind, first)
+        if missing:
+            print(f"{args.input} is missing required column(s) for the {args.kind} model: {', '.join(missing)}",
+                  file=sys.stderr)
+            return 2
+        frames = itertools.chain([first], frames)
+
+    # Chunks are large enough for the sklearn forest (forest_engine.LARGE_BATCH_ROWS). Unpickle it here,
+    # once and before pool workers fork, rather than in the first chunk of every worker
+    model = app.registry.current[MODEL_KEYS[args.kind]]
+    getattr(model, 'forest', model).estimator()
+
+    writer = ChunkWriter(args.output)
+    total = valid = chunks = 0
+    start = time.perf_counter()
+
+    def record(result):
+        nonlocal total, valid, chunks
+        frame, n_valid = result
+        writer.write(frame)
+        total += len(frame)
+        valid += n_valid
+        chunks += 1
+
+    try:
+        if workers == 1:
+            for chunk in frames:
+                record(score_frame(args.kind, chunk, args.details))
+        else:
+            # Keep a bounded number of chunks in flight so reading never runs ahead of writing
+            with multiprocessing.Pool(workers) as pool:
+                pending = deque()
+                for chunk in frames:
+                    pending.append(pool.apply_async(score_frame, (args.kind, chunk, args.details)))
+                    if len(pending) >= 2 * workers:
+                        record(pending.popleft().get())
+                while pending:
+                    record(pending.popleft().get())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {total:,} rows in {chunks} chunks with {workers} worker(s) in {elapsed:.2f}s "
+          f"({total / elapsed if elapsed else 0:,.0f} rows/sec); {valid:,} valid, {total - valid:,} rejected "
+          f"(model version {app.registry.version}).")
+    return 0 if total else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Crop and fertilizer detail catalog.
+
+The descriptive text lives in catalog.json and is parsed once at import. Each
+description is a template with an {analysis} slot, pre-split into the text
+before and after the slot, so rendering a response is two concatenations.
+"""
+import json
+import os
+
+import numpy as np
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.json')
+SLOT = '{analysis}'
+
+# Condition-analysis phrases for the crop description, in the order they are joined
+N_PHRASES = ("High Nitrogen levels detected.", "Nitrogen levels are low.", None)
+RAIN_PHRASES = (
+    "Heavy rainfall region suitable for water-intensive crops.",
+    "Low rainfall region, drought-resistant qualities needed.",
+    None,
+)
+BALANCED = "Soil and climate conditions are balanced."
+
+
+def _compile(entry):
+    head, tail = entry['desc'].split(SLOT)
+    return {'head': head, 'tail': tail, 'yield': entry['yield'], 'link': entry['link']}
+
+
+def _load(path=CATALOG_PATH):
+    with open(path, encoding='utf-8') as f:
+        raw = json.load(f)
+    crops = {name: _compile(entry) for name, entry in raw['crops'].items()}
+    ferts = {name: _compile(entry) for name, entry in raw['fertilizers'].items()}
+    return crops, _compile(raw['crop_default']), ferts, _compile(raw['fertilizer_default'])
+
+
+CROPS, CROP_DEFAULT, FERTILIZERS, FERTILIZER_DEFAULT = _load()
+
+# Every combination of the N and rainfall phrases, indexed [n_level][rain_level]
+CROP_CONDITIONS = [
+    [" ".join(p for p in (n, rain) if p) or BALANCED for rain in RAIN_PHRASES]
+    for n in N_PHRASES
+]
+
+
+def _render(template, analysis):
+    return {
+        'desc': template['head'] + analysis + template['tail'],
+        'yield': template['yield'],
+        'link': template['link']
+    }
+
+
+def crop_condition(n, rainfall):
+    n_level = 0 if n > 100 else 1 if n < 20 else 2
+    rain_level = 0 if rainfall > 200 else 1 if rainfall < 50 else 2
+    return CROP_CONDITIONS[n_level][rain_level]
+
+
+def crop_details(crop, n, rainfall):
+    return _render(CROPS.get(crop, CROP_DEFAULT), crop_condition(n, rainfall))
+
+
+def crop_details_batch(crops, n, rainfall):
+    # Condition levels for the whole batch in two vectorized passes
+    n = np.asarray(n, dtype=float)
+    rainfall = np.asarray(rainfall, dtype=float)
+    n_level = np.select([n > 100, n < 20], [0, 1], 2)
+    rain_level = np.select([rainfall > 200, rainfall < 50], [0, 1], 2)
+    return [
+        _render(CROPS.get(crop, CROP_DEFAULT), CROP_CONDITIONS[i][j])
+        for crop, i, j in zip(crops, n_level.tolist(), rain_level.tolist())
+    ]
+
+
+def fertilizer_analysis(soil_type, crop_type):
+    return f"Given your soil is {soil_type} and you are growing {crop_type},"
+
+
+def fertilizer_details(fert, soil_type='varied', crop_type='crops'):
+    return _render(FERTILIZERS.get(fert, FERTILIZER_DEFAULT), fertilizer_analysis(soil_type, crop_type))
+
+
+def fertilizer_details_batch(ferts, soil_types, crop_types):
+    # A batch usually repeats a handful of soil/crop pairs; format each pair once
+    analyses = {}
+    details = []
+    for fert, soil_type, crop_type in zip(ferts, soil_types, crop_types):
+        pair = (soil_type, crop_type)
+        analysis = analyses.get(pair)
+        if analysis is None:
+            analysis = analyses[pair] = fertilizer_analysis(soil_type, crop_type)
+        details.append(_render(FERTILIZERS.get(fert, FERTILIZER_DEFAULT), analysis))
+    return details
@@ -0,0 +1,51 @@
+"""Chunked CSV/Parquet reading and incremental writing.
+
+Parquet support needs pyarrow and is imported only when a .parquet path is used.
+"""
+import pandas as pd
+
+
+def is_parquet(path):
+    return path.endswith(('.parquet', '.pq'))
+
+
+def read_chunks(path, chunk_size):
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    # Appends DataFrames to one output file; every chunk must have the same columns
+    def __init__(self, path):
+        self.path = path
+        self.parquet = is_parquet(path)
+        self.writer = None
+        self.started = False
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = table.cast(self.writer.schema)
+            self.writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='a' if self.started else 'w', header=not self.started, index=False)
+        self.started = True
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
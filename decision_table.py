@@ -0,0 +1,139 @@
+"""Per-feature bin tables that replace the tree walk of a FlatForest.
+
+Every split compares one feature against a threshold, so the sorted distinct
+thresholds of a feature cut its axis into bins, and two values in the same bin
+take the same branch at every node of the forest. For each (feature, bin) the
+table stores, per tree, a bitmask of the leaves still reachable once every
+split on that feature has been decided (the QuickScorer formulation: a split
+that sends the row right rules out all leaves of its left subtree). A row's
+leaf in each tree is then the leftmost bit left after AND-ing its per-feature
+masks:
+
+    bin = searchsorted(thresholds[f], x[f])        one per feature
+    alive = AND of table[f][bin] over features     (trees, words)
+    leaf = lowest set bit of alive                 per tree
+
+Inference is a few array indexings whatever the tree depth, and leaves,
+probabilities and predictions match the forest exactly. Every finite value
+falls into some bin; rows with NaN or infinite values fall back to the tree
+walk.
+"""
+import numpy as np
+
+from forest_engine import FlatForest
+
+# compile() refuses forests whose tables would exceed this size
+MAX_TABLE_BYTES = 64 * 1024 * 1024
+
+
+def leaf_order(forest):
+    # Per node: its tree, and for split nodes the in-order rank range [low, high) of the leaves
+    # under the left child. Per tree: its leaves' node ids from left to right
+    is_leaf = forest.is_leaf.tolist()
+    children = forest.children.tolist()
+    tree = [0] * len(is_leaf)
+    left_low = [0] * len(is_leaf)
+    left_high = [0] * len(is_leaf)
+    leaves = []
+    for t, root in enumerate(forest.roots.tolist()):
+        order = []
+
+        def visit(node):
+            tree[node] = t
+            if is_leaf[node]:
+                order.append(node)
+                return
+            left_low[node] = len(order)
+            visit(children[2 * node])
+            left_high[node] = len(order)
+            visit(children[2 * node + 1])
+
+        visit(root)
+        leaves.append(order)
+    return np.array(tree), np.array(left_low), np.array(left_high), leaves
+
+
+class DecisionTable(FlatForest):
+    def __init__(self, forest, thresholds, offsets, table, leaf_nodes):
+        super().__init__(forest.feature, forest.threshold, forest.children, forest.value, forest.roots,
+                         forest.classes_, forest.max_depth, forest.feature_names_in_, forest.is_leaf)
+        # Large batches still go to the forest's sklearn pickle, which outruns the table there as well
+        self.source_sha256, self.estimator_path = forest.source_sha256, forest.estimator_path
+        self._estimator = forest._estimator
+        self.thresholds = thresholds    # per feature: sorted distinct split thresholds (the bin edges)
+        self.offsets = offsets          # (n_features,) table row of each feature's first bin
+        self.table = table              # (bins, n_trees, words) uint64 bitmask of leaves still reachable
+        self.leaf_nodes = leaf_nodes    # (n_trees, max leaves) node id of each tree's leaves, left to right
+        self.words = table.shape[2]
+        self._trees = np.arange(self.n_estimators)
+
+    @classmethod
+    def compile(cls, forest, max_bytes=MAX_TABLE_BYTES):
+        tree, left_low, left_high, leaves = leaf_order(forest)
+        n_trees = forest.n_estimators
+        words = -(-max(len(order) for order in leaves) // 64)
+        split = np.flatnonzero(~forest.is_leaf)
+        split_feature = forest.feature[split]
+        split_threshold = forest.threshold[split]
+        n_features = int(forest.feature.max()) + 1 if forest.n_features_in_ is None else forest.n_features_in_
+        thresholds = [np.unique(split_threshold[split_feature == f]) for f in range(n_features)]
+
+        n_bins = sum(len(edges) + 1 for edges in thresholds)
+        size = n_bins * n_trees * words * 8
+        if size > max_bytes:
+            raise ValueError(f"Decision table would take {size:,} bytes, more than the {max_bytes:,} allowed")
+
+        # Mask per split: every leaf except those under its left child, which a right turn rules out
+        bits = np.arange(words * 64)
+        ruled_out = (bits >= left_low[split, None]) & (bits < left_high[split, None])
+        masks = ~np.packbits(ruled_out, axis=1, bitorder='little').view('<u8').astype(np.uint64)
+
+        offsets = np.cumsum([0] + [len(edges) + 1 for edges in thresholds[:-1]])
+        # A split on edge k of its feature sends values in bin k + 1 and above to the right
+        rows = np.empty(len(split), dtype=np.int64)
+        for f, edges in enumerate(thresholds):
+            on_feature = split_feature == f
+            rows[on_feature] = offsets[f] + np.searchsorted(edges, split_threshold[on_feature]) + 1
+        table = np.full((n_bins, n_trees, words), ~np.uint64(0), dtype=np.uint64)
+        np.bitwise_and.at(table, (rows, tree[split]), masks)
+        # Each bin also goes right at every split below it
+        for f, edges in enumerate(thresholds):
+            block = slice(offsets[f], offsets[f] + len(edges) + 1)
+            table[block] = np.bitwise_and.accumulate(table[block], axis=0)
+
+        leaf_nodes = np.zeros((n_trees, words * 64), dtype=forest.children.dtype)
+        for t, order in enumerate(leaves):
+            leaf_nodes[t, :len(order)] = order
+        return cls(forest, thresholds, offsets, table, leaf_nodes)
+
+    @property
+    def nbytes(self):
+        # Memory added on top of the forest's own arrays
+        return self.table.nbytes + self.leaf_nodes.nbytes + sum(edges.nbytes for edges in self.thresholds)
+
+    def _apply(self, X):
+        finite = np.isfinite(X).all(axis=1)
+        if finite.all():
+            return self._lookup(X)
+        leaves = np.empty((len(X), self.n_estimators), dtype=self.leaf_nodes.dtype)
+        leaves[finite] = self._lookup(X[finite])
+        leaves[~finite] = super()._apply(X[~finite])
+        return leaves
+
+    def _lookup(self, X):
+        alive = None
+        for f, edges in enumerate(self.thresholds):
+            masks = self.table[self.offsets[f] + np.searchsorted(edges, X[:, f])]
+            # The first gather is a fresh copy, so the rest can be AND-ed into it in place
+            alive = masks if alive is None else np.bitwise_and(alive, masks, out=alive)
+
+        # Leftmost reachable leaf: the first non-empty word, then its lowest set bit
+        if self.words == 1:
+            word, first = alive[..., 0], 0
+        else:
+            first = (alive != 0).argmax(axis=2)
+            word = np.take_along_axis(alive, first[..., np.newaxis], axis=2)[..., 0]
+        lowest_bit = word & (~word + np.uint64(1))
+        # A power of two is exact in float64, and frexp gives its exponent + 1 (NumPy 1.x has no bitwise_count)
+        rank = first * 64 + np.frexp(lowest_bit.astype(np.float64))[1].astype(np.int64) - 1
+        return self.leaf_nodes[self._trees, rank]
@@ -0,0 +1,132 @@
+"""Constant-time categorical encoding shared by training and serving.
+
+A CategoryLookup maps category names (soil type, crop type) to the integer
+codes the fertilizer model was trained on. Names are matched after collapsing
+whitespace and ignoring case, so ' red ' and 'RED' both encode as 'Red'.
+Single values go through a dict; batches go through a pandas Index lookup in
+one vectorized pass. Unknown values raise UnknownCategoryError, which lists the
+valid values.
+
+train_models.py fits the lookups and stores them as LabelEncoders in
+input_encoders.pkl; model_registry.py compiles them back into lookups at load
+time, so both sides share one mapping. It reads the classes from
+encoders.json when that is current, as LabelCodes, so serving never imports
+sklearn to unpickle a LabelEncoder.
+"""
+import numpy as np
+import pandas as pd
+
+from validation import ValidationError
+
+# Batches up to this size are encoded with dict lookups; larger ones via pd.Index.get_indexer
+SMALL_BATCH_ROWS = 16
+
+
+def normalize(value):
+    return ' '.join(value.split()).casefold()
+
+
+def tidy(value):
+    # Canonical spelling used when fitting: surrounding and repeated whitespace removed
+    return ' '.join(value.split())
+
+
+class UnknownCategoryError(ValidationError):
+    def __init__(self, field, value, valid_values):
+        super().__init__(f"Unknown {field}: {value!r}. Valid values: {', '.join(valid_values)}.", field)
+        self.value = value
+        self.valid_values = list(valid_values)
+
+
+class LabelCodes:
+    # The part of a fitted LabelEncoder that serving uses, rebuilt from its classes without sklearn
+    def __init__(self, classes):
+        self.classes_ = np.array(classes, dtype=object)
+        self._codes = {name: code for code, name in enumerate(self.classes_.tolist())}
+
+    def transform(self, values):
+        codes = [self._codes.get(value, -1) for value in values]
+        if -1 in codes:
+            unseen = sorted({str(value) for value, code in zip(values, codes) if code < 0})
+            raise ValueError(f"y contains previously unseen labels: {unseen}")
+        return np.array(codes, dtype=np.int64)
+
+    def inverse_transform(self, codes):
+        return self.classes_.take(np.asarray(codes, dtype=np.int64))
+
+
+class CategoryLookup:
+    def __init__(self, field, classes):
+        # classes are in code order (LabelEncoder.classes_), so a class's index is its code
+        self.field = field
+        self.classes = [str(c) for c in classes]
+        self.codes = {}
+        for code, name in enumerate(self.classes):
+            key = normalize(name)
+            if key in self.codes:
+                raise ValueError(f"{field} classes {self.classes[self.codes[key]]!r} and {name!r} collide after normalization")
+            self.codes[key] = code
+        self._categories = pd.Index(self.classes)
+
+    @classmethod
+    def from_label_encoder(cls, field, label_encoder):
+        return cls(field, label_encoder.classes_)
+
+    @classmethod
+    def fit(cls, field, values):
+        # Sorted like LabelEncoder, with spellings that normalize to the same key merged
+        classes = {}
+        for name in sorted({tidy(v) for v in values}):
+            classes.setdefault(normalize(name), name)
+        return cls(field, sorted(classes.values()))
+
+    def to_label_encoder(self):
+        from sklearn.preprocessing import LabelEncoder
+        label_encoder = LabelEncoder()
+        label_encoder.classes_ = np.array(self.classes, dtype=object)
+        return label_encoder
+
+    def __contains__(self, value):
+        return isinstance(value, str) and normalize(value) in self.codes
+
+    def __iter__(self):
+        return iter(self.classes)
+
+    def __len__(self):
+        return len(self.classes)
+
+    def encode(self, value):
+        code = self.codes.get(normalize(value)) if isinstance(value, str) else None
+        if code is None:
+            raise UnknownCategoryError(self.field, value, self.classes)
+        return code
+
+    def _lookup(self, value):
+        return self.codes.get(normalize(value), -1) if isinstance(value, str) else -1
+
+    def _codes(self, values):
+        # -1 marks values that are unknown or not strings. Exact spellings (the common case) are
+        # coded by one hashed index lookup; only the distinct leftovers go through normalize()
+        series = pd.Series(values, dtype=object)
+        codes = self._categories.get_indexer(series).astype(np.int64)
+        rest = np.flatnonzero(codes < 0)
+        if len(rest):
+            leftovers = series.iloc[rest]
+            mapping = {value: self._lookup(value) for value in pd.unique(leftovers)}
+            codes[rest] = leftovers.map(mapping).to_numpy(dtype=np.int64)
+        return codes
+
+    def encode_many(self, values):
+        if len(values) <= SMALL_BATCH_ROWS:
+            return np.array([self.encode(v) for v in values], dtype=np.int64)
+        codes = self._codes(values)
+        unknown = np.flatnonzero(codes < 0)
+        if len(unknown):
+            raise UnknownCategoryError(self.field, list(values)[unknown[0]], self.classes)
+        return codes
+
+    def known_mask(self, values):
+        return self._codes(values) >= 0
+
+    def decode(self, codes):
+        return [self.classes[code] for code in codes]
@@ -0,0 +1,221 @@
+"""Flattened Random Forest inference.
+
+All trees of a fitted RandomForestClassifier are packed into a handful of
+contiguous NumPy arrays and every row walks all trees at once, so a single
+prediction costs a few array operations per tree level instead of 100 separate
+tree calls. Results match sklearn's predict/predict_proba exactly.
+
+That wins for request-sized inputs, but sklearn's compiled walk overtakes it
+at a few hundred rows. When the forest's pickle is known (estimator_path, set
+by model_registry), predict_proba hands matrices of large_batch_rows or more
+to the sklearn forest. The pickle is only read on the first large batch, so
+processes serving single records never import sklearn for it.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+import numpy as np
+
+# Rows evaluated together; keeps the (trees, rows, classes) gather small enough to stay in cache
+CHUNK_ROWS = 256
+# Bump when the on-disk layout written by FlatForest.save changes
+FORMAT_VERSION = 1
+ARRAYS = ('feature', 'threshold', 'children', 'value', 'roots')
+# Up to this many rows every path is stepped to max_depth without compaction bookkeeping
+SMALL_BATCH_ROWS = 8
+# From this many rows predict_proba uses the sklearn forest when available (about where it gets faster)
+LARGE_BATCH_ROWS = 256
+
+
+def load_estimator(path, sha256):
+    # The pickled forest, only if it is still the one this forest was converted from
+    with open(path, 'rb') as f:
+        data = f.read()
+    if sha256 is None or hashlib.sha256(data).hexdigest() != sha256:
+        return None
+    model = pickle.loads(data)
+    # It is given plain arrays; without this sklearn warns on every call that the feature names are missing
+    if hasattr(model, 'feature_names_in_'):
+        del model.feature_names_in_
+    return model
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, children, value, roots, classes, max_depth, feature_names=None, is_leaf=None):
+        self.feature = feature          # (nodes,) split feature, 0 for leaves
+        self.threshold = threshold      # (nodes,) split threshold, +inf for leaves
+        self.children = children        # (2 * nodes,) left/right child of each node; leaves point to themselves
+        self.value = value              # (nodes, n_classes) normalized class distribution per node
+        self.roots = roots              # (n_trees,) index of each tree's root node
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self.feature_names_in_ = feature_names
+        self.n_estimators = len(roots)
+        # Derived from children unless supplied (shared_models passes a view on shared memory)
+        self.is_leaf = children[0::2] == np.arange(len(feature)) if is_leaf is None else is_leaf
+        self.n_features_in_ = None if feature_names is None else len(feature_names)
+        # Large batches: the pickle the sklearn forest is loaded from on first use, which must hash
+        # to source_sha256. large_batch_rows = None keeps every batch on the flat walk
+        self.source_sha256 = None
+        self.estimator_path = None
+        self.large_batch_rows = LARGE_BATCH_ROWS
+        self._estimator = None
+        self._estimator_lock = threading.Lock()
+
+    @classmethod
+    def from_sklearn(cls, model, classes=None):
+        # model is a fitted RandomForestClassifier, or (given its classes) a multi-output tree or
+        # forest regressor trained on class probabilities, such as a distilled surrogate
+        regression = not hasattr(model, 'classes_')
+        classes = model.classes_ if classes is None else np.asarray(classes)
+        trees = [est.tree_ for est in getattr(model, 'estimators_', [model])]
+        n_nodes = sum(tree.node_count for tree in trees)
+        n_classes = len(classes)
+
+        feature = np.zeros(n_nodes, dtype=np.int32)
+        threshold = np.full(n_nodes, np.inf, dtype=np.float64)
+        children = np.empty(2 * n_nodes, dtype=np.int32)
+        value = np.empty((n_nodes, n_classes), dtype=np.float64)
+        roots = np.empty(len(trees), dtype=np.int32)
+
+        offset = 0
+        for t, tree in enumerate(trees):
+            count = tree.node_count
+            nodes = np.arange(offset, offset + count)
+            left = tree.children_left
+            right = tree.children_right
+            is_leaf = left == -1
+
+            feature[nodes] = np.where(is_leaf, 0, tree.feature)
+            threshold[nodes] = np.where(is_leaf, np.inf, tree.threshold)
+            children[2 * nodes] = np.where(is_leaf, nodes, left + offset)
+            children[2 * nodes + 1] = np.where(is_leaf, nodes, right + offset)
+
+            if regression:
+                # One output per class, already the mean class distribution of the leaf's samples
+                value[nodes] = tree.value[:, :, 0]
+            else:
+                # Same normalization DecisionTreeClassifier.predict_proba applies
+                proba = tree.value[:, 0, :n_classes].copy()
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+                value[nodes] = proba
+
+            roots[t] = offset
+            offset += count
+
+        feature_names = getattr(model, 'feature_names_in_', None)
+        max_depth = max(tree.max_depth for tree in trees)
+        return cls(feature, threshold, children, value, roots, classes, max_depth, feature_names)
+
+    def save(self, path, source_sha256=None):
+        # One raw .npy per array plus a small manifest, so load() can memory-map each array.
+        # source_sha256: hash of the pickle this export was converted from, checked by model_registry
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'n_estimators': self.n_estimators,
+            'max_depth': self.max_depth,
+            'classes': self.classes_.tolist(),
+            'feature_names': None if self.feature_names_in_ is None else list(self.feature_names_in_),
+        }
+        if source_sha256 is not None:
+            manifest['source_sha256'] = source_sha256
+        with open(os.path.join(path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        if manifest['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported forest format {manifest['format_version']} in {path}")
+
+        # Read-only maps: every process shares the same pages through the OS page cache
+        mmap_mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAYS}
+        feature_names = manifest['feature_names']
+        forest = cls(
+            classes=np.array(manifest['classes']),
+            max_depth=manifest['max_depth'],
+            feature_names=None if feature_names is None else np.array(feature_names, dtype=object),
+            **arrays
+        )
+        forest.source_sha256 = manifest.get('source_sha256')
+        return forest
+
+    def estimator(self):
+        # The sklearn forest for large batches, or None without a pickle (or when it has changed)
+        if self._estimator is None and self.estimator_path is not None:
+            with self._estimator_lock:
+                if self._estimator is None and self.estimator_path is not None:
+                    self._estimator = load_estimator(self.estimator_path, self.source_sha256)
+                    self.estimator_path = None
+        return self._estimator
+
+    def _check_input(self, X):
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.n_features_in_ is not None and X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features_in_}.")
+        # sklearn evaluates trees on float32 inputs; round the same way so thresholds compare identically
+        return np.ascontiguousarray(X, dtype=np.float32).astype(np.float64)
+
+    def apply(self, X):
+        X = self._check_input(X)
+        leaves = np.empty((len(X), self.n_estimators), dtype=self.children.dtype)
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves[start:start + CHUNK_ROWS] = self._apply(X[start:start + CHUNK_ROWS])
+        return leaves
+
+    def _apply(self, X):
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+
+        if n_rows <= SMALL_BATCH_ROWS:
+            # Few rows: step every path for max_depth levels, leaves loop onto themselves
+            row_offset = (np.arange(n_rows) * n_features)[:, np.newaxis]
+            node = np.broadcast_to(self.roots, (n_rows, self.n_estimators))
+            for _ in range(self.max_depth):
+                go_right = flat_X[row_offset + self.feature[node]] > self.threshold[node]
+                node = self.children[2 * node + go_right]
+            return node
+
+        # Larger chunks: drop (row, tree) paths as soon as they reach a leaf
+        node = np.tile(self.roots, n_rows)
+        leaves = node.copy()
+        position = np.arange(len(node))
+        row_offset = np.repeat(np.arange(n_rows) * n_features, self.n_estimators)
+        for _ in range(self.max_depth):
+            go_right = np.take(flat_X, row_offset + np.take(self.feature, node)) > np.take(self.threshold, node)
+            node = np.take(self.children, 2 * node + go_right)
+            done = np.take(self.is_leaf, node)
+            if done.any():
+                leaves[position[done]] = node[done]
+                active = ~done
+                node, position, row_offset = node[active], position[active], row_offset[active]
+                if not len(node):
+                    break
+        return leaves.reshape(n_rows, self.n_estimators)
+
+    def predict_proba(self, X):
+        X = self._check_input(X)
+        if self.large_batch_rows is not None and len(X) >= self.large_batch_rows and self.estimator() is not None:
+            return self._estimator.predict_proba(X)
+        proba = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self._apply(X[start:start + CHUNK_ROWS])
+            # Sum tree by tree (axis 0) to reproduce sklearn's accumulation order bit for bit
+            proba[start:start + CHUNK_ROWS] = self.value[leaves.T].sum(axis=0)
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
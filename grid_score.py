@@ -0,0 +1,173 @@
+"""Crop recommendation maps over a raster of field conditions.
+
+The input is one 2-D grid per crop feature, either stacked in a single
+(7, rows, cols) .npy file in CROP_FEATURES order or as a directory holding
+N.npy, P.npy, ... rainfall.npy. Inputs are memory-mapped and scored tile by
+tile, so memory stays bounded by the tile size. Within a tile, cells with
+identical readings are scored once.
+
+    python grid_score.py region_stack.npy maps/ --tile 512 --workers 0
+
+The output directory receives labels.npy (int16 crop codes), confidence.npy
+(float32 probability of the predicted crop) and legend.json mapping codes to
+crop names. No-data cells get code -1 and out-of-range readings -2; both have
+NaN confidence.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+import validation
+from model_registry import load_models
+
+# Same order as app.CROP_FEATURES (importing app would start the web app's model registry)
+CROP_FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+NO_DATA = -1
+OUT_OF_RANGE = -2
+
+# Loaded once per process; pool workers forked from the CLI inherit the parent's copy
+_models = None
+
+
+def get_models():
+    global _models
+    if _models is None:
+        _models = load_models()
+    return _models
+
+
+def open_features(path):
+    # Read-only memmaps, one (rows, cols) grid per feature in CROP_FEATURES order
+    if os.path.isdir(path):
+        bands = [np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in CROP_FEATURES]
+    else:
+        stack = np.load(path, mmap_mode='r')
+        if stack.ndim != 3 or stack.shape[0] != len(CROP_FEATURES):
+            raise ValueError(f"{path}: expected shape ({len(CROP_FEATURES)}, rows, cols), got {stack.shape}")
+        bands = list(stack)
+    shapes = {band.shape for band in bands}
+    if len(shapes) != 1 or len(bands[0].shape) != 2:
+        raise ValueError(f"{path}: feature grids must all be 2-D with the same shape, got {sorted(shapes)}")
+    return bands
+
+
+def tiles(shape, size):
+    rows, cols = shape
+    for r in range(0, rows, size):
+        for c in range(0, cols, size):
+            yield r, min(r + size, rows), c, min(c + size, cols)
+
+
+def unique_rows(matrix):
+    # Each row viewed as one opaque byte string: a 1-D unique, much faster than np.unique(axis=0)
+    matrix = np.ascontiguousarray(matrix)
+    rows = matrix.view(np.dtype((np.void, matrix.dtype.itemsize * matrix.shape[1]))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return matrix[first], inverse.reshape(-1)
+
+
+def score_tile(job):
+    # Runs in a worker: read one tile, score its distinct valid cells, write straight into the output rasters
+    input_path, output_dir, tile, nodata, mask_path = job
+    r0, r1, c0, c1 = tile
+    bands = open_features(input_path)
+    cells = np.stack([band[r0:r1, c0:c1] for band in bands], axis=-1).reshape(-1, len(bands)).astype(float)
+
+    present = ~np.isnan(cells).any(axis=1)
+    if nodata is not None:
+        present &= ~(cells == nodata).any(axis=1)
+    if mask_path:
+        present &= np.load(mask_path, mmap_mode='r')[r0:r1, c0:c1].reshape(-1).astype(bool)
+    in_range = validation.bounds_mask(validation.CROP_SCHEMA, CROP_FEATURES, cells)
+    valid = present & in_range
+
+    codes = np.where(present, OUT_OF_RANGE, NO_DATA).astype(np.int16)
+    confidence = np.full(len(cells), np.nan, dtype=np.float32)
+    n_unique = 0
+    if valid.any():
+        # Neighbouring cells often share readings; score each distinct row once and scatter back
+        unique, inverse = unique_rows(cells[valid])
+        n_unique = len(unique)
+        forest = get_models()['crop']
+        proba = forest.predict_proba(unique)
+        best = proba.argmax(axis=1)
+        codes[valid] = forest.classes_.take(best)[inverse]
+        confidence[valid] = proba[np.arange(n_unique), best][inverse]
+
+    shape = (r1 - r0, c1 - c0)
+    labels_out = np.load(os.path.join(output_dir, 'labels.npy'), mmap_mode='r+')
+    confidence_out = np.load(os.path.join(output_dir, 'confidence.npy'), mmap_mode='r+')
+    labels_out[r0:r1, c0:c1] = codes.reshape(shape)
+    confidence_out[r0:r1, c0:c1] = confidence.reshape(shape)
+    labels_out.flush()
+    confidence_out.flush()
+    return len(cells), int(valid.sum()), int((present & ~in_range).sum()), n_unique
+
+
+def score_grid(input_path, output_dir, tile=512, workers=1, nodata=None, mask_path=None):
+    """Score every cell of a feature grid and write the label/confidence rasters.
+
+    Returns a summary dict (cell counts, distinct cells scored, seconds).
+    """
+    start = time.perf_counter()
+    shape = open_features(input_path)[0].shape
+    models = get_models()
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Outputs are created up front; workers fill disjoint tiles in place
+    np.lib.format.open_memmap(os.path.join(output_dir, 'labels.npy'), mode='w+', dtype=np.int16, shape=shape)[:] = NO_DATA
+    np.lib.format.open_memmap(os.path.join(output_dir, 'confidence.npy'), mode='w+', dtype=np.float32, shape=shape)[:] = np.nan
+
+    jobs = [(input_path, output_dir, t, nodata, mask_path) for t in tiles(shape, tile)]
+    if workers == 1:
+        stats = [score_tile(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            stats = pool.map(score_tile, jobs, chunksize=1)
+
+    cells, valid, out_of_range, scored = (sum(column) for column in zip(*stats))
+    summary = {
+        'shape': list(shape),
+        'tiles': len(jobs),
+        'cells': cells,
+        'valid_cells': valid,
+        'no_data_cells': cells - valid - out_of_range,
+        'out_of_range_cells': out_of_range,
+        'scored_cells': scored,
+        'model_version': models.version,
+        'seconds': time.perf_counter() - start,
+    }
+    codes = {str(code): name for code, name in enumerate(models['crop_le'].classes_.tolist())}
+    codes[str(NO_DATA)] = 'no data'
+    codes[str(OUT_OF_RANGE)] = 'out of range'
+    legend = {'codes': codes, 'summary': summary}
+    with open(os.path.join(output_dir, 'legend.json'), 'w') as f:
+        json.dump(legend, f, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a grid of field conditions into crop recommendation maps.")
+    parser.add_argument('input', help='(7, rows, cols) .npy stack, or a directory of per-feature .npy grids')
+    parser.add_argument('output', help='output directory for labels.npy, confidence.npy and legend.json')
+    parser.add_argument('--tile', type=int, default=512, help='tile edge in cells (default 512)')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes; 0 = one per core (default 1)')
+    parser.add_argument('--nodata', type=float, default=None, help='value marking no-data cells (NaN always does)')
+    parser.add_argument('--mask', help='boolean (rows, cols) .npy; False cells are skipped')
+    args = parser.parse_args()
+
+    summary = score_grid(args.input, args.output, args.tile, args.workers or os.cpu_count(), args.nodata, args.mask)
+    print(f"Scored {summary['cells']:,} cells in {summary['tiles']} tiles in {summary['seconds']:.2f}s: "
+          f"{summary['valid_cells']:,} valid ({summary['scored_cells']:,} distinct), "
+          f"{summary['no_data_cells']:,} no data, {summary['out_of_range_cells']:,} out of range "
+          f"(model version {summary['model_version']}).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
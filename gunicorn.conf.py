@@ -0,0 +1,51 @@
+"""gunicorn settings for serving app.py with models in shared memory.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master loads both forests once and publishes them in a shared memory
+segment (shared_models.publish); every worker it forks attaches to that
+segment read-only instead of loading its own copy. `kill -HUP <master>`
+publishes the current models/ afresh and replaces the workers; the old segment
+is unlinked and disappears once the last old worker exits. Hot reloads inside a
+worker (model_registry) still work but load a private copy for that worker.
+"""
+import os
+
+import shared_models
+from model_registry import ModelLoadError
+
+bind = os.environ.get('AGRIVISION_BIND', '0.0.0.0:5002')
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+# Each worker imports app after the fork, so it attaches to the segment rather than inheriting a copy
+preload_app = False
+
+
+def publish(server):
+    server.shared_models = shared_models.publish('models')
+    os.environ[shared_models.SEGMENT_ENV] = server.shared_models.name
+    server.log.info("Published models in shared memory segment %s (%d bytes)",
+                    server.shared_models.name, server.shared_models.size)
+
+
+def release(segment):
+    segment.close()
+    segment.unlink()
+
+
+def on_starting(server):
+    publish(server)
+
+
+def on_reload(server):
+    # A broken retrain keeps the segment that is already published
+    previous = server.shared_models
+    try:
+        publish(server)
+    except ModelLoadError as e:
+        server.log.error("Keeping models version published before reload: %s", e)
+        return
+    release(previous)
+
+
+def on_exit(server):
+    release(server.shared_models)
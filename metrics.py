@@ -0,0 +1,212 @@
+"""Low-overhead request instrumentation with Prometheus text exposition.
+
+Counters, gauges and fixed-bucket histograms are plain Python objects guarded by
+a lock; recording a value is a dict lookup, a bisect and two additions, cheap
+enough to leave on in production. render() produces the text format served on
+/metrics.
+
+A per-request sampling profiler (stdlib only) is available when
+AGRIVISION_PROFILING=1: a background thread snapshots the request thread's stack
+every few milliseconds and the collapsed stacks are returned with the response.
+"""
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+
+# Latency buckets in seconds, 50µs to 5s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PROFILING = os.environ.get('AGRIVISION_PROFILING') == '1'
+PROFILE_INTERVAL = float(os.environ.get('AGRIVISION_PROFILE_INTERVAL_MS', 1)) / 1000
+PROFILE_TOP = 25
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f'{self.name}{format_labels(self.labels, k)} {v}' for k, v in values]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value):
+        # Per label set: [count per bucket (last one is +Inf), sum]
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self):
+        with self._lock:
+            values = sorted((k, (list(counts), total)) for k, (counts, total) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{self.name}_bucket{format_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{format_labels(self.labels, key)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+REQUESTS = Counter('agrivision_requests_total', 'Prediction requests handled.', ['endpoint'])
+REQUEST_ERRORS = Counter('agrivision_request_errors_total',
+                         'Prediction requests answered with an error (still HTTP 200).', ['endpoint', 'kind'])
+REQUEST_SECONDS = Histogram('agrivision_request_duration_seconds', 'End-to-end prediction request latency.', ['endpoint'])
+STAGE_SECONDS = Histogram('agrivision_stage_duration_seconds', 'Time spent in each prediction stage.', ['endpoint', 'stage'])
+RECORDS = Counter('agrivision_records_total', 'Records submitted for prediction.', ['endpoint'])
+REJECTED_RECORDS = Counter('agrivision_rejected_records_total', 'Records that failed validation.', ['endpoint'])
+MODEL_LOAD_SECONDS = Gauge('agrivision_model_load_seconds', 'Time taken to load each model artifact.', ['model'])
+MODEL_RELOADS = Counter('agrivision_model_reloads_total', 'Hot model reloads by outcome.', ['result'])
+SURROGATE_ROWS = Counter('agrivision_surrogate_rows_total',
+                         'Rows scored with a distilled surrogate enabled, by what answered them.', ['model', 'path'])
+
+METRICS = [REQUESTS, REQUEST_ERRORS, REQUEST_SECONDS, STAGE_SECONDS, RECORDS, REJECTED_RECORDS, MODEL_LOAD_SECONDS,
+           MODEL_RELOADS, SURROGATE_ROWS]
+
+
+def process_memory():
+    # Resident memory of this process in bytes, from /proc/self/smaps_rollup (Linux); {} elsewhere.
+    # pss divides each shared page among the processes mapping it, so summing pss over workers gives
+    # their real combined footprint; private is what this worker alone would free on exit
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if line.endswith('kB\n'))
+    except OSError:
+        return {}
+    kb = {name: int(value.split()[0]) * 1024 for name, value in fields.items()}
+    return {
+        'rss': kb['Rss'],
+        'pss': kb['Pss'],
+        'shared': kb['Shared_Clean'] + kb['Shared_Dirty'],
+        'private': kb['Private_Clean'] + kb['Private_Dirty'],
+    }
+
+
+def memory_metrics():
+    memory = Gauge('agrivision_process_memory_bytes', 'Resident memory of this worker process by kind.', ['kind'])
+    for kind, value in process_memory().items():
+        memory.set(kind, value=value)
+    return [memory]
+
+
+# Callables returning extra Metric objects at scrape time (e.g. cache statistics)
+COLLECTORS = [memory_metrics]
+
+
+def render():
+    lines = []
+    for metric in METRICS + [m for collect in COLLECTORS for m in collect()]:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def error_kind(exc):
+    # Bad input (ValueError, including ValidationError) vs. anything unexpected
+    return 'invalid_request' if isinstance(exc, ValueError) else 'exception'
+
+
+class StageClock:
+    # Records the time since the previous lap under the given stage name
+    __slots__ = ('endpoint', 'last')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(self.endpoint, stage, value=now - self.last)
+        self.last = now
+
+
+class SamplingProfiler:
+    # Samples one thread's Python stack on an interval; stop() returns the hottest collapsed stacks
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = StackCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return {
+            'seconds': time.perf_counter() - self._started,
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'stacks': [{'stack': stack, 'count': count} for stack, count in self.stacks.most_common(PROFILE_TOP)],
+        }
+
+
+def start_profiler(requested):
+    # Profiling is opt-in twice: enabled for the process and asked for by the request
+    if PROFILING and requested:
+        return SamplingProfiler()
+    return None
@@ -0,0 +1,346 @@
+"""Versioned model registry with verified, atomic hot reload.
+
+A ModelSet is everything one prediction needs (both forests and all label
+encoders), tagged with a version: a short content hash of the artifact files
+it was loaded from. Requests take the current ModelSet once and use it to the
+end, so a reload never mixes versions within a request.
+
+Reloads build and verify the new ModelSet off to the side and then replace the
+reference in one assignment; in-flight requests keep the set they started
+with. If loading or verification fails, the previous version stays active.
+Reloads are triggered by a watcher thread polling the models directory, or
+explicitly through reload().
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from decision_table import DecisionTable
+from encoders import CategoryLookup, LabelCodes
+from forest_engine import LARGE_BATCH_ROWS, FlatForest
+from prediction_cache import model_files_fingerprint
+from surrogate import DISTILL_FILE, SurrogateForest
+
+# key -> (compact export directory, pickle fallback)
+FORESTS = {'crop': ('crop_forest', 'crop_model.pkl'), 'fert': ('fertilizer_forest', 'fertilizer_model.pkl')}
+# key -> distilled surrogate export written by train_models.py --distill
+SURROGATES = {'crop': 'crop_surrogate', 'fert': 'fertilizer_surrogate'}
+ENCODERS = {'crop_le': 'crop_label_encoder.pkl', 'fert_le': 'fertilizer_label_encoder.pkl', 'input_les': 'input_encoders.pkl'}
+# Classes of every encoder, with the sha256 of the pickle they were read from (export_encoders)
+ENCODERS_FILE = 'encoders.json'
+# Feature count each forest must accept
+N_FEATURES = {'crop': 7, 'fert': 8}
+# input_encoders.pkl key -> request field it encodes
+INPUT_FIELDS = {'soil': 'Soil Type', 'crop': 'Crop Type'}
+
+
+class ModelLoadError(RuntimeError):
+    pass
+
+
+class ModelSet(dict):
+    def __init__(self, models, version, files):
+        super().__init__(models)
+        self.version = version
+        self.files = files
+        self.loaded_at = time.time()
+        # Shared memory segment the forests live in, when attached through shared_models
+        self.segment = None
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_forest(directory, key):
+    # Returns the forest and the files it was read from. The compact export is used only while its
+    # manifest records the hash of the pickle next to it, so a pickle retrained or copied in without
+    # re-exporting is loaded (and changes the version) instead of the stale export
+    compact_name, pickle_name = FORESTS[key]
+    compact_path = os.path.join(directory, compact_name)
+    pickle_path = os.path.join(directory, pickle_name)
+    manifest_path = os.path.join(compact_path, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            source = json.load(f).get('source_sha256')
+        if not os.path.exists(pickle_path) or source == file_sha256(pickle_path):
+            files = [os.path.join(compact_path, name) for name in sorted(os.listdir(compact_path))]
+            return FlatForest.load(compact_path), files
+        print(f"Ignoring {compact_path}/: it was not exported from the current {pickle_name}")
+    forest = FlatForest.from_sklearn(load_pickle(pickle_path))
+    forest.source_sha256 = file_sha256(pickle_path)
+    return forest, [pickle_path]
+
+
+def forest_source_sha256(directory, key):
+    # Hash of the pickle a forest comes from; a deployment without the pickle keeps it in the compact manifest
+    compact_name, pickle_name = FORESTS[key]
+    pickle_path = os.path.join(directory, pickle_name)
+    if os.path.exists(pickle_path):
+        return file_sha256(pickle_path)
+    with open(os.path.join(directory, compact_name, 'manifest.json')) as f:
+        return json.load(f).get('source_sha256')
+
+
+def content_version(files):
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def export_encoders(directory):
+    # Written by train_models.py once all encoder pickles are in place; unpickling them needs sklearn
+    exported = {}
+    for key, name in ENCODERS.items():
+        path = os.path.join(directory, name)
+        encoder = load_pickle(path)
+        if key == 'input_les':
+            classes = {field: encoder[field].classes_.tolist() for field in INPUT_FIELDS}
+        else:
+            classes = encoder.classes_.tolist()
+        exported[key] = {'source_sha256': file_sha256(path), 'classes': classes}
+    return exported
+
+
+def load_encoders(directory):
+    # Returns the encoders and the files they were read from. encoders.json is used while it records
+    # the hash of every encoder pickle next to it; a pickle retrained without re-exporting wins
+    path = os.path.join(directory, ENCODERS_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            exported = json.load(f)
+        current = all(
+            key in exported and (not os.path.exists(os.path.join(directory, name))
+                                 or exported[key]['source_sha256'] == file_sha256(os.path.join(directory, name)))
+            for key, name in ENCODERS.items()
+        )
+        if current:
+            encoders = {key: LabelCodes(exported[key]['classes']) for key in ENCODERS if key != 'input_les'}
+            encoders['input_les'] = {field: LabelCodes(classes)
+                                     for field, classes in exported['input_les']['classes'].items()}
+            return encoders, [path]
+        print(f"Ignoring {path}: it was not exported from the current encoder pickles")
+    paths = [os.path.join(directory, name) for name in ENCODERS.values()]
+    return {key: load_pickle(path) for key, path in zip(ENCODERS, paths)}, paths
+
+
+def input_lookups(input_les):
+    # Compiled once per model set so requests encode categories with a dict lookup
+    return {key: CategoryLookup.from_label_encoder(field, input_les[key]) for key, field in INPUT_FIELDS.items()}
+
+
+def load_models(directory='models'):
+    # Strict: any missing or unreadable artifact raises ModelLoadError instead of leaving a partial set
+    models, files = {}, []
+    try:
+        for key in FORESTS:
+            start = time.perf_counter()
+            models[key], forest_files = load_forest(directory, key)
+            files.extend(forest_files)
+            metrics.MODEL_LOAD_SECONDS.set(key, value=time.perf_counter() - start)
+        start = time.perf_counter()
+        encoders, encoder_files = load_encoders(directory)
+        models.update(encoders)
+        files.extend(encoder_files)
+        metrics.MODEL_LOAD_SECONDS.set('encoders', value=time.perf_counter() - start)
+        models['input_lookups'] = input_lookups(models['input_les'])
+        version = content_version(files)
+    except Exception as e:
+        raise ModelLoadError(f"Error loading models from {directory}/: {e}") from e
+    return ModelSet(models, version, files)
+
+
+def verify_models(models):
+    # Cheap structural checks plus a smoke prediction; raises ModelLoadError on the first problem
+    try:
+        for key, n_features in N_FEATURES.items():
+            forest = models[key]
+            if forest.n_features_in_ != n_features:
+                raise ValueError(f"{key} forest expects {forest.n_features_in_} features, not {n_features}")
+            label_encoder = models[f'{key}_le']
+            if int(forest.classes_.max()) >= len(label_encoder.classes_):
+                raise ValueError(f"{key} forest predicts classes its label encoder does not know")
+            proba = forest.predict_proba(np.zeros((2, n_features)))
+            if proba.shape != (2, len(forest.classes_)) or not np.allclose(proba.sum(axis=1), 1.0):
+                raise ValueError(f"{key} forest returned invalid probabilities")
+        for name in INPUT_FIELDS:
+            lookup = models['input_lookups'][name]
+            if not len(lookup) or lookup.encode(lookup.classes[-1]) != len(lookup) - 1:
+                raise ValueError(f"input encoder '{name}' is empty or inconsistent")
+    except ModelLoadError:
+        raise
+    except Exception as e:
+        raise ModelLoadError(f"Model verification failed: {e}") from e
+
+
+class ModelRegistry:
+    def __init__(self, directory='models', poll_interval=2.0, initial=None, fingerprint=None, decision_tables=(),
+                 surrogates=(), surrogate_threshold=None, large_batch_rows=LARGE_BATCH_ROWS):
+        # initial: an already loaded ModelSet (e.g. attached from shared memory) used instead of reading
+        # the directory; fingerprint is the directory state it was loaded from, so later changes are noticed.
+        # decision_tables: forest keys ('crop', 'fert') to compile into DecisionTables on every load.
+        # surrogates: forest keys to serve through their distilled surrogate, falling back to the forest
+        # below surrogate_threshold (default: the threshold calibrated by the trainer).
+        # large_batch_rows: batches this large go to the forest's sklearn pickle (None or 0: never)
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.decision_tables = tuple(decision_tables)
+        self.surrogates = tuple(surrogates)
+        self.surrogate_threshold = surrogate_threshold
+        self.large_batch_rows = large_batch_rows or None
+        for option, keys in (('decision table', self.decision_tables), ('surrogate', self.surrogates)):
+            unknown = sorted(set(keys) - set(FORESTS))
+            if unknown:
+                raise ValueError(f"No forest named {', '.join(unknown)} for a {option}; choose from {', '.join(FORESTS)}")
+        self._reload_lock = threading.Lock()
+        self._watch_lock = threading.Lock()
+        if initial is None:
+            self._current = self._load()
+            self._fingerprint = model_files_fingerprint(directory)
+        else:
+            self._prepare(initial)
+            verify_models(initial)
+            self._current = initial
+            self._fingerprint = model_files_fingerprint(directory) if fingerprint is None else fingerprint
+        self._watcher_pid = None
+        self.last_error = None
+        self.reloads = 0
+
+    def _load(self):
+        models = load_models(self.directory)
+        self._prepare(models)
+        verify_models(models)
+        return models
+
+    def _prepare(self, models):
+        # Exported forests score large batches with their pickle, loaded on first use if it still matches
+        for key, (_, pickle_name) in FORESTS.items():
+            forest = models[key]
+            forest.large_batch_rows = self.large_batch_rows
+            if forest.source_sha256 is not None and forest.estimator_path is None:
+                forest.estimator_path = os.path.join(self.directory, pickle_name)
+
+        # Tables are derived from the forest and exact, so one that cannot be built just leaves the forest
+        for key in self.decision_tables:
+            start = time.perf_counter()
+            try:
+                models[key] = DecisionTable.compile(models[key])
+            except ValueError as e:
+                print(f"Serving the {key} forest without a decision table: {e}")
+                continue
+            metrics.MODEL_LOAD_SECONDS.set(f'{key}_table', value=time.perf_counter() - start)
+
+        # A requested surrogate is part of the model set: missing or mismatched raises ModelLoadError.
+        # It must have been distilled from the forest pickle now in the directory, so a retrained forest
+        # is never served next to the old forest's surrogate (the previous version keeps serving instead)
+        for key in self.surrogates:
+            path = os.path.join(self.directory, SURROGATES[key])
+            start = time.perf_counter()
+            try:
+                with open(os.path.join(path, 'manifest.json')) as f:
+                    source = json.load(f).get('source_sha256')
+                if source is None or source != forest_source_sha256(self.directory, key):
+                    raise ValueError(f"it was not distilled from the current {FORESTS[key][1]}")
+                with open(os.path.join(path, DISTILL_FILE)) as f:
+                    calibrated = json.load(f)['threshold']
+                threshold = calibrated if self.surrogate_threshold is None else self.surrogate_threshold
+                models[key] = SurrogateForest(key, FlatForest.load(path), models[key], threshold)
+            except Exception as e:
+                raise ModelLoadError(f"Error loading the {key} surrogate from {path}/: {e}") from e
+            models.files = models.files + [os.path.join(path, name) for name in sorted(os.listdir(path))]
+            metrics.MODEL_LOAD_SECONDS.set(f'{key}_surrogate', value=time.perf_counter() - start)
+        if self.surrogates:
+            # Surrogates change what is served, so their files are part of the version too
+            models.version = content_version(models.files)
+
+    @property
+    def current(self):
+        # One attribute read; callers should hold on to the result for the whole request
+        if self.poll_interval and self._watcher_pid != os.getpid():
+            self.start_watching()
+        return self._current
+
+    @property
+    def version(self):
+        return self._current.version
+
+    def reload(self):
+        # Load and verify off to the side, then swap; returns a status dict and never raises
+        with self._reload_lock:
+            self._fingerprint = model_files_fingerprint(self.directory)
+            previous = self._current
+            try:
+                candidate = self._load()
+            except ModelLoadError as e:
+                self.last_error = str(e)
+                metrics.MODEL_RELOADS.inc('failed')
+                return {'status': 'failed', 'version': previous.version, 'error': str(e)}
+            self.last_error = None
+            if candidate.version == previous.version:
+                return {'status': 'unchanged', 'version': previous.version}
+            self._current = candidate
+            self.reloads += 1
+            metrics.MODEL_RELOADS.inc('success')
+            return {'status': 'reloaded', 'version': candidate.version, 'previous_version': previous.version}
+
+    def start_watching(self):
+        # Also called after a fork: threads do not survive it, so each worker process starts its own watcher
+        with self._watch_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, daemon=True, name='model-watcher').start()
+
+    def _watch(self):
+        # Reload once the directory has changed and then stayed the same for one interval,
+        # so a retrain that writes several files is picked up as a whole
+        pending = None
+        while True:
+            time.sleep(self.poll_interval)
+            fingerprint = model_files_fingerprint(self.directory)
+            if fingerprint == self._fingerprint:
+                pending = None
+            elif fingerprint != pending:
+                pending = fingerprint
+            else:
+                pending = None
+                result = self.reload()
+                print(f"Model reload: {result}")
+
+    def status(self):
+        current = self._current
+        # A surrogate wraps the forest (or decision table) it falls back to
+        forests = {key: getattr(current[key], 'forest', current[key]) for key in FORESTS}
+        return {
+            'version': current.version,
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(current.loaded_at)),
+            'files': current.files,
+            'shared_memory': None if current.segment is None else {'segment': current.segment.name,
+                                                                   'bytes': current.segment.size},
+            'reloads': self.reloads,
+            'last_error': self.last_error,
+            'decision_tables': {key: forests[key].nbytes for key in self.decision_tables
+                                if isinstance(forests[key], DecisionTable)},
+            'surrogate_thresholds': {key: current[key].threshold for key in self.surrogates},
+            'watching': bool(self.poll_interval),
+            'poll_interval_seconds': self.poll_interval,
+        }
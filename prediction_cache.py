@@ -0,0 +1,122 @@
+"""In-process LRU/TTL cache for prediction responses.
+
+Keys are the request's feature values in a fixed order, with numeric values
+rounded per feature so equivalent readings share an entry. The whole cache is
+dropped whenever the fingerprint callable (e.g. model file mtimes) changes.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def model_files_fingerprint(directory='models'):
+    # (path, mtime, size) of every file below the models directory
+    entries = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(entries))
+
+
+class PredictionCache:
+    def __init__(self, fields, max_size=10000, ttl=300.0, rounding=None, fingerprint=None, check_interval=1.0):
+        self.fields = list(fields)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.rounding = rounding or {}
+        self.fingerprint = fingerprint
+        self.check_interval = check_interval
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_fingerprint = fingerprint() if fingerprint else None
+        self._next_check = time.monotonic() + check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def key(self, data, *extra):
+        # None means "do not cache" (missing field or a value that cannot be keyed); extra
+        # distinguishes response variants of the same input, e.g. the requested top_k
+        try:
+            parts = []
+            for name in self.fields:
+                value = data[name]
+                digits = self.rounding.get(name)
+                if digits is not None and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    value = round(float(value), digits)
+                parts.append(value)
+            key = tuple(parts) + extra
+            hash(key)
+            return key
+        except (KeyError, TypeError):
+            return None
+
+    def _check_fingerprint(self, now):
+        # Called with the lock held; stat the model files at most once per check_interval
+        if self.fingerprint is None or now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        current = self.fingerprint()
+        if current != self._current_fingerprint:
+            self._current_fingerprint = current
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get(self, key):
+        if key is None or not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._check_fingerprint(now)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if key is None or not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._check_fingerprint(now)
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,162 @@
+"""Serve both forests from one shared memory segment across worker processes.
+
+Without this, every server worker loads its own copy of the crop and
+fertilizer forests. Here the parent process loads the models once (publish)
+and copies every forest array, plus the label encoders, into a single
+multiprocessing.shared_memory segment. Each worker then attaches by segment
+name (attach) and gets FlatForest objects whose arrays are read-only views
+onto that segment, so the pages exist in memory once however many workers
+run.
+
+The segment starts with an 8-byte header length and a JSON header describing
+where each array lives; the arrays follow, 64-byte aligned.
+
+gunicorn.conf.py wires this up: the master publishes in on_starting and
+exports the segment name as AGRIVISION_SHARED_MODELS, and app.py attaches
+when that variable is set.
+"""
+import json
+import pickle
+import sys
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from forest_engine import ARRAYS, FlatForest
+from model_registry import FORESTS, ModelLoadError, ModelSet, input_lookups, load_models, verify_models
+from prediction_cache import model_files_fingerprint
+
+# Environment variable holding the segment name for workers to attach to
+SEGMENT_ENV = 'AGRIVISION_SHARED_MODELS'
+# Bump when the segment layout changes
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+HEADER_LENGTH_BYTES = 8
+# Forest arrays placed in the segment; is_leaf is derived, but sharing it saves each worker recomputing it
+SHARED_ARRAYS = ARRAYS + ('is_leaf',)
+ENCODER_KEYS = ('crop_le', 'fert_le', 'input_les')
+
+
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def layout(models):
+    # Offsets are relative to the start of the data area, which follows the header
+    header = {'format_version': FORMAT_VERSION, 'forests': {}}
+    offset = 0
+    for key in FORESTS:
+        forest = models[key]
+        arrays = {}
+        for name in SHARED_ARRAYS:
+            array = np.asarray(getattr(forest, name))
+            arrays[name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str}
+            offset = align(offset + array.nbytes)
+        header['forests'][key] = {
+            'arrays': arrays,
+            'classes': forest.classes_.tolist(),
+            'max_depth': forest.max_depth,
+            'feature_names': None if forest.feature_names_in_ is None else list(forest.feature_names_in_),
+            'source_sha256': forest.source_sha256,
+        }
+    return header, offset
+
+
+def publish(directory='models'):
+    """Load and verify the models in directory and copy them into a new shared memory segment.
+
+    Returns the SharedMemory object; the caller keeps it open while workers run and
+    calls close() and unlink() when they are gone.
+    """
+    fingerprint = model_files_fingerprint(directory)
+    models = load_models(directory)
+    verify_models(models)
+
+    header, data_size = layout(models)
+    encoders = pickle.dumps({key: models[key] for key in ENCODER_KEYS})
+    header.update({
+        'version': models.version,
+        'files': models.files,
+        'fingerprint': fingerprint,
+        'encoders': {'offset': data_size, 'size': len(encoders)},
+    })
+    header_bytes = json.dumps(header).encode()
+    data_start = align(HEADER_LENGTH_BYTES + len(header_bytes))
+
+    segment = SharedMemory(create=True, size=data_start + data_size + len(encoders))
+    try:
+        segment.buf[:HEADER_LENGTH_BYTES] = len(header_bytes).to_bytes(HEADER_LENGTH_BYTES, 'little')
+        segment.buf[HEADER_LENGTH_BYTES:HEADER_LENGTH_BYTES + len(header_bytes)] = header_bytes
+        for key, spec in header['forests'].items():
+            for name, array_spec in spec['arrays'].items():
+                view(segment, data_start, array_spec)[...] = getattr(models[key], name)
+        segment.buf[data_start + data_size:data_start + data_size + len(encoders)] = encoders
+    except BaseException:
+        segment.close()
+        segment.unlink()
+        raise
+    return segment
+
+
+def view(segment, data_start, spec):
+    return np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']), buffer=segment.buf,
+                      offset=data_start + spec['offset'])
+
+
+def open_segment(name):
+    # Attaching must not register the segment with this process's resource tracker: a tracker
+    # started by a worker unlinks the segment when that worker exits (track=False needs Python 3.13)
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def attach(name):
+    """Build a ModelSet whose forests are read-only views onto the published segment.
+
+    Returns (models, fingerprint), where fingerprint is the models directory state at
+    publish time, for ModelRegistry to watch for later changes.
+    """
+    try:
+        segment = open_segment(name)
+    except OSError as e:
+        raise ModelLoadError(f"Cannot attach to shared models segment {name!r}: {e}") from e
+    try:
+        header_length = int.from_bytes(segment.buf[:HEADER_LENGTH_BYTES], 'little')
+        header = json.loads(bytes(segment.buf[HEADER_LENGTH_BYTES:HEADER_LENGTH_BYTES + header_length]))
+        if header['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"unsupported segment format {header['format_version']}")
+        data_start = align(HEADER_LENGTH_BYTES + header_length)
+
+        models = {}
+        for key, spec in header['forests'].items():
+            arrays = {}
+            for array_name, array_spec in spec['arrays'].items():
+                arrays[array_name] = view(segment, data_start, array_spec)
+                arrays[array_name].flags.writeable = False
+            feature_names = spec['feature_names']
+            models[key] = FlatForest(
+                classes=np.array(spec['classes']),
+                max_depth=spec['max_depth'],
+                feature_names=None if feature_names is None else np.array(feature_names, dtype=object),
+                **arrays
+            )
+            models[key].source_sha256 = spec['source_sha256']
+        encoders = header['encoders']
+        start = data_start + encoders['offset']
+        models.update(pickle.loads(segment.buf[start:start + encoders['size']]))
+        models['input_lookups'] = input_lookups(models['input_les'])
+    except Exception as e:
+        segment.close()
+        raise ModelLoadError(f"Shared models segment {name!r} is unreadable: {e}") from e
+
+    model_set = ModelSet(models, header['version'], header['files'])
+    model_set.segment = segment
+    fingerprint = tuple(tuple(entry) for entry in header['fingerprint'])
+    return model_set, fingerprint
@@ -0,0 +1,95 @@
+"""Distilled surrogates: one small tree standing in for a 100-tree forest.
+
+train_models.py --distill labels the training CSV plus generated samples with
+the forest's class probabilities (its soft outputs) and fits a single
+multi-output regression tree, capped at a fixed number of leaves, to
+reproduce them. The tree is exported through FlatForest like the forests and
+is a small fraction of their size and latency.
+
+A leaf-capped tree grows deep, and walking it level by level costs more per
+row than walking the shallower forest, so the surrogate is always served
+through a DecisionTable (exact, and independent of depth).
+
+The surrogate's top probability serves as its confidence. On held-out rows
+the trainer picks the lowest confidence threshold above which the surrogate
+agrees with the forest at least as often as required, and stores it with the
+export in distill.json. At serving time SurrogateForest answers confident
+rows from the surrogate and sends the rest to the full forest.
+"""
+import numpy as np
+
+import metrics
+from decision_table import DecisionTable
+
+# Candidate confidence thresholds, lowest (most rows served by the surrogate) first
+THRESHOLDS = tuple(np.round(np.arange(0.3, 1.0, 0.05), 2).tolist())
+DISTILL_FILE = 'distill.json'
+
+
+def fit_surrogate(teacher, X, max_leaf_nodes=512, random_state=42):
+    """Fit a multi-output regression tree to the teacher's predict_proba on X (a DataFrame).
+
+    Returns the FlatForest export of the tree, with the teacher's classes.
+    """
+    from sklearn.tree import DecisionTreeRegressor
+    from forest_engine import FlatForest
+    tree = DecisionTreeRegressor(max_leaf_nodes=max_leaf_nodes, random_state=random_state)
+    tree.fit(X, teacher.predict_proba(X.to_numpy(dtype=float)))
+    return FlatForest.from_sklearn(tree, classes=teacher.classes_)
+
+
+def agreement_report(teacher, surrogate, X, target):
+    # How often the surrogate's top class matches the teacher's, overall and above each threshold.
+    # served_agreement counts fallback rows as agreeing, since the teacher answers them
+    teacher_labels = teacher.predict(X)
+    proba = surrogate.predict_proba(X)
+    agree = surrogate.classes_.take(proba.argmax(axis=1)) == teacher_labels
+    confidence = proba.max(axis=1)
+
+    thresholds = []
+    for threshold in THRESHOLDS:
+        confident = confidence >= threshold
+        thresholds.append({
+            'threshold': threshold,
+            'coverage': float(confident.mean()),
+            'agreement': float(agree[confident].mean()) if confident.any() else 1.0,
+            'served_agreement': float(1 - (confident & ~agree).mean()),
+        })
+    # Lowest threshold meeting the target; 1.0 (only unanimous leaves) when none does
+    chosen = next((t for t in thresholds if t['agreement'] >= target), None)
+    return {
+        'rows': len(X),
+        'agreement': float(agree.mean()),
+        'target_agreement': target,
+        'threshold': chosen['threshold'] if chosen else 1.0,
+        'coverage': chosen['coverage'] if chosen else float((confidence >= 1.0).mean()),
+        'served_agreement': chosen['served_agreement'] if chosen else float(1 - ((confidence >= 1.0) & ~agree).mean()),
+        'thresholds': thresholds,
+    }
+
+
+class SurrogateForest:
+    # Drop-in for a forest in a ModelSet: confident rows from the surrogate, the rest from the forest
+    def __init__(self, name, surrogate, forest, threshold):
+        if not np.array_equal(surrogate.classes_, forest.classes_) or surrogate.n_features_in_ != forest.n_features_in_:
+            raise ValueError(f"{name} surrogate does not match its forest's classes and features")
+        self.name = name
+        self.surrogate = surrogate if isinstance(surrogate, DecisionTable) else DecisionTable.compile(surrogate)
+        self.forest = forest
+        self.threshold = threshold
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        self.feature_names_in_ = forest.feature_names_in_
+
+    def predict_proba(self, X):
+        X = self.forest._check_input(X)
+        proba = self.surrogate.predict_proba(X)
+        unsure = np.flatnonzero(proba.max(axis=1) < self.threshold)
+        if len(unsure):
+            proba[unsure] = self.forest.predict_proba(X[unsure])
+        metrics.SURROGATE_ROWS.inc(self.name, 'surrogate', amount=len(X) - len(unsure))
+        metrics.SURROGATE_ROWS.inc(self.name, 'forest', amount=len(unsure))
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
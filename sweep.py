@@ -0,0 +1,107 @@
+"""What-if sensitivity sweeps over one or two input parameters.
+
+A sweep holds a base record fixed and varies one or two numeric fields over
+evenly spaced values. The full grid is built as one feature matrix and scored
+by a single predict_proba call. Along the last swept axis, consecutive points
+with the same prediction are compressed into intervals, so a fine sweep
+answers with a handful of decision-boundary segments.
+
+    {"base": {...record...},
+     "sweep": [{"field": "N", "start": 20, "stop": 140, "steps": 121},
+               {"field": "rainfall", "relative": 0.3, "steps": 61}]}
+
+"relative": r sweeps the base value ±r (0.3 = ±30%).
+"""
+import numpy as np
+
+import validation
+
+DEFAULT_STEPS = 51
+MAX_STEPS = 1000
+# Upper bound on grid points (product of the axes' steps)
+MAX_POINTS = 50000
+
+
+def parse_axes(spec, base, schema):
+    # Returns [(field, values)] after checking that every swept value passes the schema bounds
+    if not isinstance(spec, list) or len(spec) not in (1, 2):
+        raise ValueError("'sweep' must be a list of one or two parameter ranges.")
+    numeric = {field.name for field in schema if field.kind == 'number'}
+    axes = []
+    for axis in spec:
+        if not isinstance(axis, dict):
+            raise ValueError("Each sweep range must be a JSON object.")
+        field = axis.get('field')
+        if field not in numeric:
+            raise ValueError(f"Cannot sweep {field!r}; choose one of {', '.join(sorted(numeric))}.")
+        if field in (name for name, _ in axes):
+            raise ValueError(f"{field} is swept twice.")
+
+        try:
+            if 'relative' in axis:
+                spread = float(axis['relative'])
+                start, stop = base[field] * (1 - spread), base[field] * (1 + spread)
+            else:
+                start, stop = float(axis['start']), float(axis['stop'])
+            steps = int(axis.get('steps', DEFAULT_STEPS))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Sweep range for {field} needs numeric 'start' and 'stop' (or 'relative') and integer 'steps'.")
+        if not 2 <= steps <= MAX_STEPS:
+            raise ValueError(f"Sweep range for {field} must have between 2 and {MAX_STEPS} steps, got {steps}.")
+
+        # Schema bounds are intervals, so checking both ends covers every value in between
+        for value in (start, stop):
+            validation.validate_record(schema, dict(base, **{field: value}))
+        # Rounded so the echoed interval bounds are clean numbers
+        axes.append((field, np.linspace(start, stop, steps).round(6)))
+
+    points = int(np.prod([len(values) for _, values in axes]))
+    if points > MAX_POINTS:
+        raise ValueError(f"Sweep of {points} points exceeds the limit of {MAX_POINTS}.")
+    return axes
+
+
+def grid(base_row, columns, axes):
+    # One row per grid point (first axis slowest), base values everywhere except the swept columns
+    mesh = np.meshgrid(*[values for _, values in axes], indexing='ij')
+    matrix = np.repeat(np.asarray(base_row, dtype=float)[None, :], mesh[0].size, axis=0)
+    for (field, _), values in zip(axes, mesh):
+        matrix[:, columns.index(field)] = values.ravel()
+    return matrix
+
+
+def intervals(labels, probabilities, values):
+    # Run-length encode one line of predictions into [from, to] intervals of the swept values
+    labels = np.asarray(labels)
+    starts = np.r_[0, np.flatnonzero(labels[1:] != labels[:-1]) + 1]
+    ends = np.r_[starts[1:], len(labels)] - 1
+    low = np.minimum.reduceat(probabilities, starts)
+    high = np.maximum.reduceat(probabilities, starts)
+    return [
+        {'from': values[s], 'to': values[e], 'points': e - s + 1, 'prediction': labels[s],
+         'min_probability': lo, 'max_probability': hi}
+        for s, e, lo, hi in zip(starts.tolist(), ends.tolist(), low.tolist(), high.tolist())
+    ]
+
+
+def summarize(axes, labels, probabilities, surface=False):
+    # labels/probabilities are per grid point, in grid() order
+    shape = tuple(len(values) for _, values in axes)
+    labels = np.asarray(labels).reshape(shape)
+    probabilities = np.asarray(probabilities, dtype=float).reshape(shape)
+    body = {'axes': [{'field': field, 'start': values[0], 'stop': values[-1], 'steps': len(values)}
+                     for field, values in axes]}
+
+    last_field, last_values = axes[-1]
+    last_values = last_values.tolist()
+    if len(axes) == 1:
+        body['intervals'] = intervals(labels, probabilities, last_values)
+    else:
+        first_field, first_values = axes[0]
+        body['rows'] = [
+            {first_field: value, 'intervals': intervals(labels[i], probabilities[i], last_values)}
+            for i, value in enumerate(first_values.tolist())
+        ]
+    if surface:
+        body['surface'] = {'predictions': labels.tolist(), 'probabilities': probabilities.tolist()}
+    return body
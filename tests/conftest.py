@@ -0,0 +1,10 @@
+"""Shared setup: run from the project root with the app's background work switched off."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The app and the models load relative paths (models/, catalog.json, the CSVs)
+os.chdir(ROOT)
+os.environ.setdefault('AGRIVISION_MODEL_POLL_SECONDS', '0')
+os.environ.setdefault('AGRIVISION_CACHE_SIZE', '0')
@@ -0,0 +1,30 @@
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', None)
+    monkeypatch.setattr(app.app, 'debug', False)
+    return app.app.test_client()
+
+
+def test_admin_routes_are_closed_without_a_token(client):
+    # The test client calls from 127.0.0.1, which alone is not enough
+    assert client.get('/admin/models').status_code == 403
+    assert client.post('/admin/reload').status_code == 403
+
+
+def test_debug_server_admits_local_callers(client, monkeypatch):
+    monkeypatch.setattr(app.app, 'debug', True)
+    assert client.get('/admin/models').status_code == 200
+    assert client.get('/admin/models', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 403
+
+
+def test_token_is_required_when_set(client, monkeypatch):
+    monkeypatch.setattr(app, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr(app.app, 'debug', True)
+    assert client.get('/admin/models').status_code == 403
+    assert client.get('/admin/models', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.get('/admin/models', headers={'X-Admin-Token': 'secret'}).status_code == 200
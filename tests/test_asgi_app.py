@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import pandas as pd
+
+import app
+import asgi_app
+
+
+def call(path, body, content_type):
+    # One request through the ASGI app, without a server
+    sent = []
+    scope = {'type': 'http', 'path': path, 'method': 'POST', 'query_string': b'',
+             'headers': [(b'content-type', content_type)], 'client': ('127.0.0.1', 0)}
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app.app(scope, receive, send))
+    return json.loads(sent[-1]['body'])
+
+
+def multipart(field, csv):
+    boundary = b'agrivision-test'
+    body = (b'--' + boundary + b'\r\n'
+            b'Content-Disposition: form-data; name="' + field + b'"; filename="rows.csv"\r\n'
+            b'Content-Type: text/csv\r\n\r\n' + csv + b'\r\n'
+            b'--' + boundary + b'--\r\n')
+    return body, b'multipart/form-data; boundary=' + boundary
+
+
+def test_multipart_upload_matches_the_flask_app():
+    csv = pd.read_csv('crop_recommendation.csv').drop(columns='label').head(10).to_csv(index=False).encode()
+    body, content_type = multipart(b'file', csv)
+
+    expected = app.app.test_client().post('/predict-crop', data=body, content_type=content_type.decode()).get_json()
+
+    assert call('/predict-crop', body, content_type) == expected
+    assert len(expected['results']) == 10
+
+
+def test_multipart_upload_without_a_file_field_is_rejected():
+    body, content_type = multipart(b'data', b'N,P\n1,2\n')
+    assert call('/predict-crop', body, content_type) == {
+        'error': "A multipart upload must carry the CSV in a 'file' field"}
+
+
+def test_flushed_batches_are_held_until_they_finish():
+    batcher = asgi_app.MicroBatcher(lambda records, top_k: ([{'n': len(records)}] * len(records), []), max_size=2)
+
+    async def two_requests():
+        requests = asyncio.gather(batcher.submit({}), batcher.submit({}))
+        await asyncio.sleep(0)
+        running = len(batcher.tasks)
+        return await requests, running, len(batcher.tasks)
+
+    results, running, finished = asyncio.run(two_requests())
+    assert results == [{'n': 2}, {'n': 2}]
+    assert (running, finished) == (1, 0)
@@ -0,0 +1,29 @@
+import pandas as pd
+
+import bulk_score
+
+
+def test_bad_cell_rejects_only_its_row():
+    frame = pd.read_csv('crop_recommendation.csv').drop(columns='label').head(50).astype(str)
+    frame.loc[7, 'K'] = 'n/a'
+    out, n_valid = bulk_score.score_frame('crop', frame)
+    assert n_valid == 49
+    assert out['error'].dropna().to_dict() == {7: "K must be a finite number, got 'n/a'"}
+    assert out['prediction'].isna().tolist() == [row == 7 for row in range(50)]
+
+
+def test_missing_columns_are_reported():
+    frame = pd.read_csv('fertilizer_recommendation.csv').drop(columns=['Moisture', 'Crop Type'])
+    assert bulk_score.missing_columns('fertilizer', frame) == ['Moisture', 'Crop Type']
+
+
+def test_large_chunks_match_the_flat_walk(monkeypatch):
+    frame = pd.read_csv('fertilizer_recommendation.csv').drop(columns='Fertilizer Name')
+    forest = bulk_score.app.registry.current['fert']
+    assert len(frame) >= forest.large_batch_rows
+    out, _ = bulk_score.score_frame('fertilizer', frame)
+    assert forest.estimator() is not None
+
+    monkeypatch.setattr(forest, 'large_batch_rows', None)
+    walked, _ = bulk_score.score_frame('fertilizer', frame)
+    assert out['prediction'].tolist() == walked['prediction'].tolist()
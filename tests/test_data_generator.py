@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+import data_generator
+
+
+def test_crop_rows_are_whole_crops():
+    # 50 rows round down to two per crop
+    rows = next(data_generator.crop_chunks(50, np.random.default_rng(0)))
+    assert len(rows) == 44
+    assert rows['label'].value_counts().to_dict() == {name: 2 for name in data_generator.CROPS}
+
+
+def test_fewer_crop_rows_than_crops_are_rejected():
+    with pytest.raises(ValueError, match='at least 22 rows'):
+        next(data_generator.crop_chunks(len(data_generator.CROPS) - 1, np.random.default_rng(0)))
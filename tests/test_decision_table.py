@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from decision_table import DecisionTable
+from forest_engine import CHUNK_ROWS, SMALL_BATCH_ROWS
+from model_registry import load_models
+
+
+@pytest.fixture(scope='module')
+def models():
+    return load_models()
+
+
+@pytest.fixture(scope='module', params=['crop', 'fert'])
+def case(request, models):
+    # (forest, its table, rows spread over and beyond the range the forest splits on)
+    forest = models[request.param]
+    table = DecisionTable.compile(forest)
+    rng = np.random.default_rng(0)
+    low = np.array([edges.min() for edges in table.thresholds])
+    high = np.array([edges.max() for edges in table.thresholds])
+    X = rng.uniform(low - (high - low) / 2, high + (high - low) / 2, size=(2000, len(low)))
+    return forest, table, X
+
+
+def test_matches_forest(case):
+    forest, table, X = case
+    np.testing.assert_array_equal(table.apply(X), forest.apply(X))
+    np.testing.assert_array_equal(table.predict_proba(X), forest.predict_proba(X))
+    np.testing.assert_array_equal(table.predict(X), forest.predict(X))
+
+
+@pytest.mark.parametrize('rows', [1, SMALL_BATCH_ROWS, SMALL_BATCH_ROWS + 1, CHUNK_ROWS + 1])
+def test_matches_forest_at_batch_sizes(case, rows):
+    forest, table, X = case
+    np.testing.assert_array_equal(table.predict_proba(X[:rows]), forest.predict_proba(X[:rows]))
+
+
+def test_values_on_the_split_thresholds(case):
+    # A value equal to a threshold goes left; the bin edges must agree
+    forest, table, X = case
+    rows = []
+    for f, edges in enumerate(table.thresholds):
+        on_edges = np.repeat(X[:1], len(edges), axis=0)
+        on_edges[:, f] = edges
+        rows.append(on_edges)
+    rows = np.concatenate(rows)
+    np.testing.assert_array_equal(table.apply(rows), forest.apply(rows))
+
+
+def test_non_finite_rows_fall_back_to_the_tree_walk(case):
+    forest, table, X = case
+    X = X[:10].copy()
+    X[0, 0], X[3, -1], X[5, 1], X[7] = np.nan, np.inf, -np.inf, np.nan
+    np.testing.assert_array_equal(table.apply(X), forest.apply(X))
+    np.testing.assert_array_equal(table.predict_proba(X), forest.predict_proba(X))
+
+
+def test_leaves_span_several_words(models):
+    # The crop trees have more than 64 leaves, so the lookup has to search past the first word
+    assert DecisionTable.compile(models['crop']).words > 1
+
+
+def test_oversized_table_is_refused(case):
+    forest, _, _ = case
+    with pytest.raises(ValueError, match='Decision table would take'):
+        DecisionTable.compile(forest, max_bytes=1024)
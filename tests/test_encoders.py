@@ -0,0 +1,60 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import LabelEncoder
+
+import encoders
+from encoders import CategoryLookup, LabelCodes, UnknownCategoryError
+
+SOILS = CategoryLookup('Soil Type', ['Black', 'Clayey', 'Loamy', 'Red', 'Sandy'])
+
+
+@pytest.mark.parametrize('name', ['crop_label_encoder.pkl', 'fertilizer_label_encoder.pkl'])
+def test_label_codes_match_the_label_encoder(name):
+    with open(f'models/{name}', 'rb') as f:
+        label_encoder = pickle.load(f)
+    codes = LabelCodes(label_encoder.classes_.tolist())
+    classes = label_encoder.classes_.tolist()
+
+    np.testing.assert_array_equal(codes.classes_, label_encoder.classes_)
+    np.testing.assert_array_equal(codes.transform(classes[::-1]), label_encoder.transform(classes[::-1]))
+    order = np.arange(len(classes))[::-1]
+    np.testing.assert_array_equal(codes.inverse_transform(order), label_encoder.inverse_transform(order))
+    with pytest.raises(ValueError, match='previously unseen labels'):
+        codes.transform([classes[0], 'no such class'])
+
+
+def test_names_match_ignoring_case_and_whitespace():
+    assert SOILS.encode('Red') == SOILS.encode(' red ') == SOILS.encode('RED') == 3
+    assert 'sandy\t' in SOILS
+    assert CategoryLookup('Crop Type', ['Ground Nuts']).encode(' ground   NUTS') == 0
+    with pytest.raises(UnknownCategoryError) as error:
+        SOILS.encode('Mud')
+    assert error.value.valid_values == ['Black', 'Clayey', 'Loamy', 'Red', 'Sandy']
+    assert 5 not in SOILS
+
+
+def test_classes_that_collide_after_normalization_are_refused():
+    with pytest.raises(ValueError, match="'Red' and 'red ' collide"):
+        CategoryLookup('Soil Type', ['Red', 'red '])
+
+
+def test_large_batches_code_like_single_values():
+    values = ['Red', ' red', 'SANDY', 'Black', 'Loamy', 'clayey'] * 4
+    assert len(values) > encoders.SMALL_BATCH_ROWS
+    expected = [SOILS.encode(value) for value in values]
+    np.testing.assert_array_equal(SOILS.encode_many(values), expected)
+    np.testing.assert_array_equal(SOILS.known_mask(values + ['Mud', 3]), [True] * len(values) + [False, False])
+    with pytest.raises(UnknownCategoryError, match="'Mud'"):
+        SOILS.encode_many(values + ['Mud'])
+
+
+@pytest.mark.parametrize('field', ['Soil Type', 'Crop Type'])
+def test_fit_codes_the_bundled_csv_like_label_encoder(field):
+    values = pd.read_csv('fertilizer_recommendation.csv')[field]
+    lookup = CategoryLookup.fit(field, values)
+    label_encoder = LabelEncoder().fit(values)
+    assert lookup.classes == label_encoder.classes_.tolist()
+    np.testing.assert_array_equal(lookup.encode_many(values.tolist()), label_encoder.transform(values))
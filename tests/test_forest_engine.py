@@ -0,0 +1,94 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from forest_engine import CHUNK_ROWS, LARGE_BATCH_ROWS, SMALL_BATCH_ROWS, FlatForest
+
+# Either side of the per-row path and of the chunk boundary, and several chunks with a remainder
+BATCH_SIZES = [1, 2, SMALL_BATCH_ROWS - 1, SMALL_BATCH_ROWS, SMALL_BATCH_ROWS + 1,
+               CHUNK_ROWS - 1, CHUNK_ROWS, CHUNK_ROWS + 1, 3 * CHUNK_ROWS + 5]
+
+# The forests are compared against sklearn on plain arrays, as the app scores them
+pytestmark = pytest.mark.filterwarnings('ignore:X does not have valid feature names')
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+@pytest.fixture(scope='module', params=['crop', 'fertilizer'])
+def case(request):
+    # (sklearn forest, its FlatForest, CSV rows plus jittered copies that land near split thresholds)
+    if request.param == 'crop':
+        X = pd.read_csv('crop_recommendation.csv').drop(columns='label').to_numpy(dtype=float)
+    else:
+        frame = pd.read_csv('fertilizer_recommendation.csv').drop(columns='Fertilizer Name')
+        encoders = load_pickle('models/input_encoders.pkl')
+        frame['Soil Type'] = encoders['soil'].transform(frame['Soil Type'])
+        frame['Crop Type'] = encoders['crop'].transform(frame['Crop Type'])
+        X = frame.to_numpy(dtype=float)
+    rng = np.random.default_rng(0)
+    X = np.concatenate([X, X + rng.normal(0, 0.5, size=X.shape)])
+    model = load_pickle(f'models/{request.param}_model.pkl')
+    return model, FlatForest.from_sklearn(model), X[rng.permutation(len(X))]
+
+
+@pytest.mark.parametrize('rows', BATCH_SIZES)
+def test_matches_sklearn_at_every_batch_size(case, rows):
+    model, forest, X = case
+    batch = X[:rows]
+    np.testing.assert_array_equal(forest.predict_proba(batch), model.predict_proba(batch))
+    np.testing.assert_array_equal(forest.predict(batch), model.predict(batch))
+
+
+def test_small_and_large_batch_paths_find_the_same_leaves(case):
+    _, forest, X = case
+    batch = X[:CHUNK_ROWS]
+    one_by_one = np.concatenate([forest.apply(X[i:i + 1]) for i in range(len(batch))])
+    np.testing.assert_array_equal(forest.apply(batch), one_by_one)
+
+
+def test_single_row_as_1d_array(case):
+    model, forest, X = case
+    np.testing.assert_array_equal(forest.predict_proba(X[0]), model.predict_proba(X[:1]))
+
+
+def test_memory_mapped_export_matches(case, tmp_path):
+    model, forest, X = case
+    forest.save(tmp_path / 'forest')
+    loaded = FlatForest.load(tmp_path / 'forest')
+    assert isinstance(loaded.threshold, np.memmap)
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(loaded.classes_, model.classes_)
+
+
+def test_wrong_feature_count_is_rejected(case):
+    _, forest, X = case
+    with pytest.raises(ValueError, match='features'):
+        forest.predict_proba(X[:, :-1])
+
+
+def test_large_batches_go_to_the_pickle_and_match_the_walk():
+    forest = FlatForest.load('models/crop_forest')
+    forest.estimator_path = 'models/crop_model.pkl'
+    X = pd.read_csv('crop_recommendation.csv').drop(columns='label').to_numpy(dtype=float)
+
+    small = forest.predict_proba(X[:LARGE_BATCH_ROWS - 1])
+    assert forest._estimator is None
+    large = forest.predict_proba(X)
+    assert forest._estimator is not None
+
+    forest.large_batch_rows = None
+    np.testing.assert_array_equal(large, forest.predict_proba(X))
+    np.testing.assert_array_equal(small, forest.predict_proba(X[:LARGE_BATCH_ROWS - 1]))
+
+
+def test_changed_pickle_is_not_used_for_large_batches():
+    forest = FlatForest.load('models/crop_forest')
+    forest.estimator_path = 'models/fertilizer_model.pkl'
+    X = pd.read_csv('crop_recommendation.csv').drop(columns='label').to_numpy(dtype=float)
+    forest.predict_proba(X)
+    assert forest.estimator() is None
@@ -0,0 +1,80 @@
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+import surrogate
+from model_registry import ENCODERS_FILE, ModelRegistry, file_sha256, load_models, load_pickle
+
+
+def retrain_crop_pickle(directory, registry):
+    # A new crop_model.pkl copied in without re-exporting crop_forest/ or crop_surrogate/
+    frame = pd.read_csv('crop_recommendation.csv')
+    X = frame.drop(columns='label')
+    y = registry.current['crop_le'].transform(frame['label'])
+    with open(directory / 'crop_model.pkl', 'wb') as f:
+        pickle.dump(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y), f)
+
+
+def test_retrained_pickle_replaces_stale_compact_export(tmp_path):
+    directory = tmp_path / 'models'
+    shutil.copytree('models', directory)
+    registry = ModelRegistry(str(directory), 0)
+    assert registry.current['crop'].n_estimators == 100
+
+    retrain_crop_pickle(directory, registry)
+
+    result = registry.reload()
+    assert result['status'] == 'reloaded'
+    assert registry.current['crop'].n_estimators == 5
+    assert str(directory / 'crop_model.pkl') in registry.current.files
+
+
+def test_surrogate_of_an_older_forest_is_refused(tmp_path):
+    directory = tmp_path / 'models'
+    shutil.copytree('models', directory)
+    forest = ModelRegistry(str(directory), 0).current['crop']
+    X = pd.read_csv('crop_recommendation.csv').drop(columns='label')
+    path = directory / 'crop_surrogate'
+    surrogate.fit_surrogate(forest, X, max_leaf_nodes=64).save(
+        path, source_sha256=file_sha256(directory / 'crop_model.pkl'))
+    with open(path / surrogate.DISTILL_FILE, 'w') as f:
+        json.dump({'threshold': 0.5}, f)
+    registry = ModelRegistry(str(directory), 0, surrogates=['crop'])
+    version = registry.version
+
+    retrain_crop_pickle(directory, registry)
+
+    result = registry.reload()
+    assert result['status'] == 'failed'
+    assert 'not distilled from the current crop_model.pkl' in result['error']
+    assert registry.version == version
+    assert registry.current['crop'].forest.n_estimators == 100
+
+
+def test_serving_does_not_import_sklearn():
+    # The encoders come from encoders.json and the forests from their compact exports
+    code = "import sys, app; app.registry.current; print('sklearn' in sys.modules)"
+    env = dict(os.environ, AGRIVISION_MODEL_POLL_SECONDS='0')
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, env=env, check=True)
+    assert result.stdout.split()[-1] == 'False'
+
+
+def test_stale_encoders_json_falls_back_to_the_pickles(tmp_path):
+    directory = tmp_path / 'models'
+    shutil.copytree('models', directory)
+    assert load_models(str(directory)).files[-1] == str(directory / ENCODERS_FILE)
+
+    label_encoder = load_pickle(directory / 'crop_label_encoder.pkl')
+    label_encoder.classes_ = label_encoder.classes_[::-1]
+    with open(directory / 'crop_label_encoder.pkl', 'wb') as f:
+        pickle.dump(label_encoder, f)
+
+    models = load_models(str(directory))
+    assert str(directory / ENCODERS_FILE) not in models.files
+    assert models['crop_le'].classes_.tolist() == label_encoder.classes_.tolist()
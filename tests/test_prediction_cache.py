@@ -0,0 +1,19 @@
+import app
+from prediction_cache import PredictionCache
+
+READING = {'N': 100, 'P': 40, 'K': 40, 'temperature': 25.0, 'humidity': 80.0, 'ph': 6.5, 'rainfall': 200.0}
+
+
+def test_default_keys_are_exact():
+    cache = PredictionCache(app.CROP_FEATURES, rounding=app.CACHE_ROUNDING)
+    assert cache.key(READING, None, 'v1') == cache.key(dict(READING, N=100.0), None, 'v1')
+    assert cache.key(READING, None, 'v1') != cache.key(dict(READING, N=100.004), None, 'v1')
+
+
+def test_cached_response_does_not_depend_on_request_order(monkeypatch):
+    # N=100.004 crosses the N > 100 rule of the details; N=100 cached first must not answer it
+    nearby = dict(READING, N=100.004)
+    uncached = app.predict_crop_batch([nearby])[0][0]
+    monkeypatch.setattr(app, 'crop_cache', PredictionCache(app.CROP_FEATURES, 100, 300, app.CACHE_ROUNDING))
+    app.predict_crop_batch([READING])
+    assert app.predict_crop_batch([nearby])[0][0] == uncached
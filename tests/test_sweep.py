@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import sweep
+import validation
+
+BASE = {'N': 90, 'P': 42, 'K': 43, 'temperature': 20.8, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 200.0}
+COLUMNS = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+
+def test_label_change_mid_axis_splits_the_interval():
+    values = [0.0, 1.0, 2.0, 3.0, 4.0]
+    result = sweep.intervals(['rice', 'rice', 'maize', 'maize', 'maize'], np.array([0.9, 0.7, 0.6, 0.8, 0.5]), values)
+    assert result == [
+        {'from': 0.0, 'to': 1.0, 'points': 2, 'prediction': 'rice', 'min_probability': 0.7, 'max_probability': 0.9},
+        {'from': 2.0, 'to': 4.0, 'points': 3, 'prediction': 'maize', 'min_probability': 0.5, 'max_probability': 0.8},
+    ]
+
+
+def test_one_axis_with_a_single_label_is_one_interval():
+    axes = sweep.parse_axes([{'field': 'N', 'start': 20, 'stop': 140, 'steps': 7}], BASE, validation.CROP_SCHEMA)
+    assert [field for field, _ in axes] == ['N']
+    assert axes[0][1].tolist() == [20, 40, 60, 80, 100, 120, 140]
+
+    body = sweep.summarize(axes, ['rice'] * 7, np.linspace(0.5, 0.8, 7))
+    assert body['axes'] == [{'field': 'N', 'start': 20.0, 'stop': 140.0, 'steps': 7}]
+    assert body['intervals'] == [{'from': 20.0, 'to': 140.0, 'points': 7, 'prediction': 'rice',
+                                  'min_probability': 0.5, 'max_probability': 0.8}]
+    assert 'rows' not in body
+
+
+def test_two_axes_give_one_row_of_intervals_per_first_axis_value():
+    spec = [{'field': 'N', 'start': 0, 'stop': 100, 'steps': 3}, {'field': 'rainfall', 'relative': 0.5, 'steps': 4}]
+    axes = sweep.parse_axes(spec, BASE, validation.CROP_SCHEMA)
+    assert axes[1][1].tolist() == [100, 166.666667, 233.333333, 300]
+    matrix = sweep.grid([BASE[name] for name in COLUMNS], COLUMNS, axes)
+    assert matrix.shape == (12, len(COLUMNS))
+    assert matrix[:4, 0].tolist() == [0] * 4
+    assert matrix[:4, 6].tolist() == axes[1][1].tolist()
+
+    # Rainfall flips the label at a different point on each row
+    labels = np.array([['a', 'a', 'b', 'b'], ['a', 'b', 'b', 'b'], ['a', 'a', 'a', 'a']])
+    body = sweep.summarize(axes, labels.ravel(), np.full(12, 0.5), surface=True)
+    assert [row['N'] for row in body['rows']] == [0, 50, 100]
+    assert [[(i['prediction'], i['points']) for i in row['intervals']] for row in body['rows']] == [
+        [('a', 2), ('b', 2)], [('a', 1), ('b', 3)], [('a', 4)]]
+    assert body['rows'][0]['intervals'][1]['from'] == 233.333333
+    assert body['surface']['predictions'] == labels.tolist()
+
+
+@pytest.mark.parametrize('axis, message', [
+    ({'field': 'N', 'start': 100, 'stop': 300}, 'Nitrogen levels over 200'),
+    ({'field': 'rainfall', 'relative': 1.5}, 'Rainfall cannot be negative'),
+    ({'field': 'label', 'start': 0, 'stop': 1}, "Cannot sweep 'label'"),
+    ({'field': 'N', 'start': 0, 'stop': 100, 'steps': 1}, 'between 2 and'),
+])
+def test_out_of_bounds_sweeps_are_rejected(axis, message):
+    with pytest.raises(ValueError, match=message):
+        sweep.parse_axes([axis], BASE, validation.CROP_SCHEMA)
+
+
+def test_grids_over_max_points_are_rejected():
+    steps = sweep.MAX_POINTS // 500 + 1
+    spec = [{'field': 'N', 'start': 0, 'stop': 100, 'steps': 500}, {'field': 'P', 'start': 0, 'stop': 100, 'steps': steps}]
+    with pytest.raises(ValueError, match=f'Sweep of {500 * steps} points exceeds the limit of {sweep.MAX_POINTS}'):
+        sweep.parse_axes(spec, BASE, validation.CROP_SCHEMA)
@@ -0,0 +1,109 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import validation
+
+
+@pytest.fixture(scope='module')
+def client():
+    import app
+    return app.app.test_client()
+
+
+def crop_csv(rows=20):
+    return pd.read_csv('crop_recommendation.csv').drop(columns='label').head(rows)
+
+
+def test_one_bad_csv_cell_rejects_only_its_row(client):
+    frame = crop_csv().astype(object)
+    frame.loc[3, 'N'] = 'abc'
+    body = frame.to_csv(index=False)
+
+    response = client.post('/predict-crop', data=body, content_type='text/csv').get_json()
+
+    assert response['errors'] == [{'row': 3, 'field': 'N', 'error': "N must be a finite number, got 'abc'"}]
+    assert [i for i, result in enumerate(response['results']) if 'prediction' not in result] == [3]
+
+
+def test_coerce_numbers_keeps_only_unparseable_text():
+    frame = pd.read_csv(io.StringIO("N,P\n72,1\nabc,2\n,3\n"))
+    coerced = validation.coerce_numbers(validation.CROP_SCHEMA, frame)
+    assert coerced['N'].tolist()[:2] == [72.0, 'abc']
+    assert pd.isna(coerced['N'][2])
+    assert coerced['P'].tolist() == [1, 2, 3]
+
+
+# Well-formed and broken records of every kind, so both validation paths report on each
+CROP_RECORDS = [
+    {'N': 90, 'P': 42, 'K': 43, 'temperature': 20.8, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9},
+    {'N': 90, 'P': 42, 'K': 43, 'temperature': 20.8, 'humidity': 82.0, 'ph': 6.5},
+    {'N': '90', 'P': 42, 'K': 43, 'temperature': 20.8, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9},
+    {'N': True, 'P': 42, 'K': 43, 'temperature': 20.8, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9},
+    {'N': 90, 'P': 42, 'K': 43, 'temperature': float('nan'), 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9},
+    {'N': 90, 'P': 42, 'K': 43, 'temperature': 20.8, 'humidity': float('inf'), 'ph': 6.5, 'rainfall': 202.9},
+    {'N': 250, 'P': 42, 'K': 43, 'temperature': 75, 'humidity': 82.0, 'ph': 15, 'rainfall': -1},
+    {'N': 0, 'P': 0, 'K': 0, 'temperature': -10, 'humidity': 100, 'ph': 14, 'rainfall': 0},
+    {'N': None, 'P': 42, 'K': 43, 'temperature': 20.8, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9},
+    # JSON integers too large for a float, and one that still fits
+    {'N': 10 ** 400, 'P': -10 ** 400, 'K': 2 ** 70, 'temperature': 20.8, 'humidity': 82.0, 'ph': 6.5, 'rainfall': 202.9},
+    ['not', 'an', 'object'],
+    {},
+]
+
+FERTILIZER_RECORDS = [
+    {'Temperature': 26, 'Humidity': 52, 'Moisture': 38, 'Soil Type': 'Sandy', 'Crop Type': 'Maize',
+     'Nitrogen': 37, 'Potassium': 0, 'Phosphorous': 0},
+    {'Temperature': 26, 'Humidity': 52, 'Moisture': -1, 'Soil Type': 'Mud', 'Crop Type': 'Maize',
+     'Nitrogen': 250, 'Potassium': 0, 'Phosphorous': 0},
+    {'Temperature': 26, 'Humidity': 52, 'Moisture': 38, 'Soil Type': 3, 'Crop Type': None,
+     'Nitrogen': 37, 'Potassium': 'x', 'Phosphorous': 0},
+    {'Temperature': 26, 'Humidity': 52, 'Moisture': 38, 'Soil Type': 'Loamy', 'Crop Type': 'Rice',
+     'Nitrogen': 37, 'Potassium': 0, 'Phosphorous': 0},
+    'not an object',
+]
+
+FERTILIZER_CHOICES = {'Soil Type': {'Sandy', 'Loamy'}, 'Crop Type': {'Maize'}}
+
+
+def per_record(schema, records, choices=None):
+    # The small-batch path of check_records, applied to a batch of any size
+    valid = np.ones(len(records), dtype=bool)
+    violations = []
+    for row, data in enumerate(records):
+        for name, error in validation.record_violations(schema, data, choices):
+            violations.append(validation.Violation(row, name, error))
+            valid[row] = False
+    return valid, violations
+
+
+@pytest.mark.parametrize('schema, records, choices', [
+    (validation.CROP_SCHEMA, CROP_RECORDS, None),
+    (validation.FERTILIZER_SCHEMA, FERTILIZER_RECORDS, FERTILIZER_CHOICES),
+])
+def test_single_record_and_vectorized_validation_agree(schema, records, choices):
+    # Repeated past SMALL_BATCH_ROWS so check_records takes the vectorized path
+    records = records * (validation.SMALL_BATCH_ROWS // len(records) + 1)
+    _, valid, violations = validation.validate_records(schema, records, choices)
+    expected_valid, expected_violations = per_record(schema, records, choices)
+    np.testing.assert_array_equal(valid, expected_valid)
+    assert violations == expected_violations
+
+    checked_valid, checked_violations = validation.check_records(schema, records, choices)
+    np.testing.assert_array_equal(checked_valid, expected_valid)
+    assert checked_violations == expected_violations
+
+
+def test_int_too_large_for_a_float_rejects_only_its_row(client):
+    records = crop_csv(20).to_dict('records')
+    records[5]['N'] = 10 ** 400
+    body = '[' + ', '.join(json.dumps(record) for record in records) + ']'
+
+    response = client.post('/predict-crop', data=body, content_type='application/json').get_json()
+
+    assert [(error['row'], error['field']) for error in response['errors']] == [(5, 'N')]
+    assert response['errors'][0]['error'].startswith('N must be a finite number, got 1000')
+    assert [i for i, result in enumerate(response['results']) if 'prediction' not in result] == [5]
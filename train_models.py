@@ -1,80 +1,307 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score
 from sklearn.preprocessing import LabelEncoder
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import itertools
+import json
 import pickle
 import os
+import shutil
+import sklearn
+import time
 
-# Create models directory
-if not os.path.exists('models'):
-    os.makedirs('models')
+import data_generator
+import surrogate
+from encoders import CategoryLookup
+from forest_engine import ARRAYS, FlatForest
+from model_registry import ENCODERS_FILE, export_encoders, file_sha256
 
-def train_crop_model():
+RANDOM_STATE = 42
+DEFAULT_PARAMS = {'n_estimators': 100, 'max_depth': None}
+
+# Candidate grid for --search
+SEARCH_GRID = {'n_estimators': [25, 50, 100, 200], 'max_depth': [None, 8, 12, 16]}
+LATENCY_SLACK = 0.10
+# Generated rows scored for the surrogate's agreement report, as a fraction of --distill-samples
+DISTILL_HOLDOUT = 0.2
+
+def atomic_pickle(obj, path):
+    # Write next to the target and rename over it, so readers never see a half-written file
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f)
+    os.replace(tmp, path)
+
+def atomic_json(obj, path):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+def atomic_forest(engine, path, extra=None, source=None):
+    # Build the compact export (plus any extra JSON files) in a sibling directory, then swap it in.
+    # source: the pickle the export was converted from; its hash goes in the manifest
+    tmp = f"{path}.tmp-{os.getpid()}"
+    old = f"{path}.old-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    engine.save(tmp, source_sha256=None if source is None else file_sha256(source))
+    for name, obj in (extra or {}).items():
+        with open(os.path.join(tmp, name), 'w') as f:
+            json.dump(obj, f, indent=2)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+def single_row_latency_ms(model, X, repeats=200, rounds=3):
+    # Median latency of the serving path (flattened forest) on one row, best of a few rounds
+    return engine_latency_ms(FlatForest.from_sklearn(model), X, repeats, rounds)
+
+def engine_latency_ms(engine, X, repeats=200, rounds=3):
+    rows = X[:repeats]
+    medians = []
+    for _ in range(rounds):
+        timings = []
+        for i in range(repeats):
+            row = rows[i % len(rows)].reshape(1, -1)
+            start = time.perf_counter()
+            engine.predict(row)
+            timings.append(time.perf_counter() - start)
+        medians.append(np.median(timings))
+    return float(min(medians) * 1000)
+
+def search_params(X_train, y_train, n_jobs, cv, tolerance):
+    # Score every candidate on accuracy, pickled size and single-row latency. Among forests whose
+    # CV accuracy is within `tolerance` of the best, keep the smallest one that is no more than
+    # LATENCY_SLACK slower than the fastest (latency is noisy, size is exact)
+    candidates = []
+    for n_estimators, max_depth in itertools.product(SEARCH_GRID['n_estimators'], SEARCH_GRID['max_depth']):
+        params = {'n_estimators': n_estimators, 'max_depth': max_depth}
+        model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=n_jobs, **params)
+        scores = cross_val_score(model, X_train, y_train, cv=cv, n_jobs=1)
+        model.fit(X_train, y_train)
+        model.n_jobs = None
+        candidates.append({
+            'params': params,
+            'cv_accuracy': float(scores.mean()),
+            'size_bytes': len(pickle.dumps(model)),
+            'latency_ms': single_row_latency_ms(model, X_train.to_numpy(dtype=float)),
+        })
+
+    best_accuracy = max(c['cv_accuracy'] for c in candidates)
+    eligible = [c for c in candidates if c['cv_accuracy'] >= best_accuracy - tolerance]
+    fastest = min(c['latency_ms'] for c in eligible)
+    quick = [c for c in eligible if c['latency_ms'] <= fastest * (1 + LATENCY_SLACK)]
+    chosen = min(quick, key=lambda c: (c['size_bytes'], -c['cv_accuracy']))
+    return chosen['params'], candidates
+
+def fit_and_report(name, X, y, args):
+    timings = {}
+    start = time.perf_counter()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=RANDOM_STATE)
+
+    params, candidates = DEFAULT_PARAMS, None
+    if args.search:
+        params, candidates = search_params(X_train, y_train, args.jobs, args.cv, args.tolerance)
+        timings['search_seconds'] = time.perf_counter() - start
+
+    fit_start = time.perf_counter()
+    model = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=args.jobs, **params)
+    model.fit(X_train, y_train)
+    timings['fit_seconds'] = time.perf_counter() - fit_start
+    # Serve single-threaded: joblib start-up dominates one-row predictions
+    model.n_jobs = None
+
+    preds = model.predict(X_test)
+    acc = accuracy_score(y_test, preds)
+    print(f"{name} Model Accuracy: {acc * 100:.2f}% (n_estimators={params['n_estimators']}, max_depth={params['max_depth']})")
+
+    report = {
+        'params': params,
+        'random_state': RANDOM_STATE,
+        'test_accuracy': acc,
+        'size_bytes': len(pickle.dumps(model)),
+        'latency_ms': single_row_latency_ms(model, X_test.to_numpy(dtype=float)),
+        'timings': timings,
+    }
+    if candidates:
+        report['search'] = candidates
+    return model, report, (X_train, X_test)
+
+def array_bytes(engine):
+    return int(sum(getattr(engine, name).nbytes for name in ARRAYS))
+
+def distill(name, model, X_train, X_test, generated, args):
+    # generated(n, rng) returns n generator rows encoded like X_train. The surrogate learns the
+    # forest's probabilities on the training split plus generated rows; agreement is measured on the
+    # test split plus fresh generated rows, which also calibrate the fallback threshold
+    start = time.perf_counter()
+    rng = np.random.default_rng(RANDOM_STATE)
+    teacher = FlatForest.from_sklearn(model)
+    train = pd.concat([X_train, generated(args.distill_samples, rng)], ignore_index=True)
+    student = surrogate.fit_surrogate(teacher, train, args.distill_leaves, RANDOM_STATE)
+    fit_seconds = time.perf_counter() - start
+
+    holdout = pd.concat([X_test, generated(int(args.distill_samples * DISTILL_HOLDOUT), rng)], ignore_index=True)
+    holdout = holdout.to_numpy(dtype=float)
+    report = surrogate.agreement_report(teacher, student, holdout, args.distill_agreement)
+    served = surrogate.SurrogateForest(name, student, teacher, report['threshold'])
+    report.update({
+        'training_rows': len(train),
+        'max_leaf_nodes': args.distill_leaves,
+        'leaves': int(student.is_leaf.sum()),
+        'array_bytes': array_bytes(student),
+        'forest_array_bytes': array_bytes(teacher),
+        'latency_ms': engine_latency_ms(served.surrogate, holdout),
+        'served_latency_ms': engine_latency_ms(served, holdout),
+        'forest_latency_ms': engine_latency_ms(teacher, holdout),
+        'fit_seconds': fit_seconds,
+    })
+    print(f"{name} surrogate: {report['agreement'] * 100:.2f}% agreement with the forest "
+          f"({report['served_agreement'] * 100:.2f}% served, {report['coverage'] * 100:.0f}% of rows "
+          f"above threshold {report['threshold']})")
+    return student, report
+
+def export_surrogate(name, model, X_train, X_test, generated, args, path, report, source):
+    # Without --distill, a surrogate left over from an earlier forest would no longer match it.
+    # source: the forest pickle it is distilled from, which model_registry checks it against
+    if not args.distill:
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    student, report['surrogate'] = distill(name, model, X_train, X_test, generated, args)
+    atomic_forest(student, path, {surrogate.DISTILL_FILE: report['surrogate']}, source=source)
+
+def generated_crop_features(n, rng):
+    return next(data_generator.crop_chunks(n, rng, chunk_size=max(n, 1))).drop(columns='label')
+
+def train_crop_model(args):
     print("Training Crop Model...")
+    start = time.perf_counter()
     df = pd.read_csv('crop_recommendation.csv')
-    
+
     X = df.drop('label', axis=1)
     y = df['label']
-    
+
     le = LabelEncoder()
     y_encoded = le.fit_transform(y)
-    
-    X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=42)
-    
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
-    
-    preds = model.predict(X_test)
-    acc = accuracy_score(y_test, preds)
-    print(f"Crop Model Accuracy: {acc * 100:.2f}%")
-    
-    with open('models/crop_model.pkl', 'wb') as f:
-        pickle.dump(model, f)
-        
-    with open('models/crop_label_encoder.pkl', 'wb') as f:
-        pickle.dump(le, f)
-        
+
+    model, report, (X_train, X_test) = fit_and_report('Crop', X, y_encoded, args)
+
+    model_path = os.path.join(args.output, 'crop_model.pkl')
+    atomic_pickle(model, model_path)
+    atomic_pickle(le, os.path.join(args.output, 'crop_label_encoder.pkl'))
+
+    # Compact array export that app.py memory-maps instead of unpickling
+    atomic_forest(FlatForest.from_sklearn(model), os.path.join(args.output, 'crop_forest'), source=model_path)
+    export_surrogate('crop', model, X_train, X_test, generated_crop_features, args,
+                     os.path.join(args.output, 'crop_surrogate'), report, model_path)
+
+    report['dataset'] = {'path': 'crop_recommendation.csv', 'sha256': file_sha256('crop_recommendation.csv'), 'rows': len(df)}
+    report['timings']['total_seconds'] = time.perf_counter() - start
     print("Crop Model Saved.")
+    return 'crop', report
 
-def train_fertilizer_model():
-    print("\nTraining Fertilizer Model...")
+def train_fertilizer_model(args):
+    print("Training Fertilizer Model...")
+    start = time.perf_counter()
     df = pd.read_csv('fertilizer_recommendation.csv')
-    
-    # Encoders for categorical inputs
-    le_soil = LabelEncoder()
-    df['Soil Type'] = le_soil.fit_transform(df['Soil Type'])
-    
-    le_crop = LabelEncoder()
-    df['Crop Type'] = le_crop.fit_transform(df['Crop Type'])
-    
+
+    # Encoders for categorical inputs: the same lookups the app compiles from input_encoders.pkl,
+    # so training and serving normalize and code categories identically
+    soil_lookup = CategoryLookup.fit('Soil Type', df['Soil Type'])
+    df['Soil Type'] = soil_lookup.encode_many(df['Soil Type'].tolist())
+
+    crop_lookup = CategoryLookup.fit('Crop Type', df['Crop Type'])
+    df['Crop Type'] = crop_lookup.encode_many(df['Crop Type'].tolist())
+
     le_fert = LabelEncoder()
     df['Fertilizer Name'] = le_fert.fit_transform(df['Fertilizer Name'])
-    
+
     X = df.drop('Fertilizer Name', axis=1)
     y = df['Fertilizer Name']
-    
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
-    
-    preds = model.predict(X_test)
-    acc = accuracy_score(y_test, preds)
-    print(f"Fertilizer Model Accuracy: {acc * 100:.2f}%")
-    
-    with open('models/fertilizer_model.pkl', 'wb') as f:
-        pickle.dump(model, f)
-        
-    with open('models/input_encoders.pkl', 'wb') as f:
-        pickle.dump({'soil': le_soil, 'crop': le_crop}, f)
-        
-    with open('models/fertilizer_label_encoder.pkl', 'wb') as f:
-        pickle.dump(le_fert, f)
-        
+
+    model, report, (X_train, X_test) = fit_and_report('Fertilizer', X, y, args)
+
+    model_path = os.path.join(args.output, 'fertilizer_model.pkl')
+    atomic_pickle(model, model_path)
+    atomic_pickle({'soil': soil_lookup.to_label_encoder(), 'crop': crop_lookup.to_label_encoder()},
+                  os.path.join(args.output, 'input_encoders.pkl'))
+    atomic_pickle(le_fert, os.path.join(args.output, 'fertilizer_label_encoder.pkl'))
+
+    atomic_forest(FlatForest.from_sklearn(model), os.path.join(args.output, 'fertilizer_forest'), source=model_path)
+
+    def generated(n, rng):
+        # Generator rows coded with the lookups just fitted; categories the CSV never saw are dropped
+        rows = next(data_generator.fertilizer_chunks(n, rng, chunk_size=max(n, 1)))[X.columns]
+        rows = rows[soil_lookup.known_mask(rows['Soil Type'].tolist()) & crop_lookup.known_mask(rows['Crop Type'].tolist())]
+        rows['Soil Type'] = soil_lookup.encode_many(rows['Soil Type'].tolist())
+        rows['Crop Type'] = crop_lookup.encode_many(rows['Crop Type'].tolist())
+        return rows
+
+    export_surrogate('fert', model, X_train, X_test, generated, args,
+                     os.path.join(args.output, 'fertilizer_surrogate'), report, model_path)
+
+    report['dataset'] = {'path': 'fertilizer_recommendation.csv', 'sha256': file_sha256('fertilizer_recommendation.csv'), 'rows': len(df)}
+    report['timings']['total_seconds'] = time.perf_counter() - start
     print("Fertilizer Model Saved.")
+    return 'fertilizer', report
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the crop and fertilizer models.")
+    parser.add_argument('--search', action='store_true', help='cross-validated search over tree count/depth')
+    parser.add_argument('--cv', type=int, default=5, help='folds for --search (default 5)')
+    parser.add_argument('--tolerance', type=float, default=0.005,
+                        help='accuracy a smaller/faster forest may give up in --search (default 0.005)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='cores per model (default: half the machine each, the two models train side by side)')
+    parser.add_argument('--output', default='models', help='artifact directory (default models/)')
+    parser.add_argument('--distill', action='store_true',
+                        help='also distill each forest into a one-tree surrogate (served with AGRIVISION_SURROGATES)')
+    parser.add_argument('--distill-samples', type=int, default=100000,
+                        help='generated rows added to the training split for distillation (default 100000)')
+    parser.add_argument('--distill-leaves', type=int, default=512, help='surrogate leaf budget (default 512)')
+    parser.add_argument('--distill-agreement', type=float, default=0.999,
+                        help='agreement with the forest required above the fallback threshold (default 0.999)')
+    args = parser.parse_args()
+    # The crop holdout is generated too, and needs at least one row per crop
+    min_distill_samples = int(np.ceil(len(data_generator.CROPS) / DISTILL_HOLDOUT))
+    if args.distill and args.distill_samples < min_distill_samples:
+        parser.error(f"--distill-samples must be at least {min_distill_samples}")
+    if args.jobs is None:
+        args.jobs = max(1, (os.cpu_count() or 1) // 2)
+
+    os.makedirs(args.output, exist_ok=True)
+    start = time.perf_counter()
+
+    # The two models are independent: train them in separate processes
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(train_crop_model, args), pool.submit(train_fertilizer_model, args)]
+        reports = dict(future.result() for future in futures)
+
+    manifest = {
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'sklearn_version': sklearn.__version__,
+        'total_seconds': time.perf_counter() - start,
+        'models': reports,
+    }
+    atomic_json(manifest, os.path.join(args.output, 'manifest.json'))
+    # Encoder classes as JSON, so the app reads them without importing sklearn
+    atomic_json(export_encoders(args.output), os.path.join(args.output, ENCODERS_FILE))
+
+    print(f"\nTraining finished in {manifest['total_seconds']:.1f}s")
+    for name, report in reports.items():
+        print(f"  {name:<10} accuracy {report['test_accuracy'] * 100:.2f}%  size {report['size_bytes'] / 1e6:.2f} MB"
+              f"  latency {report['latency_ms']:.3f} ms  fit {report['timings']['fit_seconds']:.1f}s")
+        if 'surrogate' in report:
+            distilled = report['surrogate']
+            print(f"  {'':<10} surrogate agreement {distilled['agreement'] * 100:.2f}%"
+                  f"  size {distilled['array_bytes'] / 1e6:.2f} MB ({distilled['forest_array_bytes'] / distilled['array_bytes']:.0f}x smaller)"
+                  f"  latency {distilled['latency_ms']:.3f} ms ({distilled['forest_latency_ms'] / distilled['latency_ms']:.1f}x faster),"
+                  f" {distilled['served_latency_ms']:.3f} ms with fallback below {distilled['threshold']}")
 
 if __name__ == "__main__":
-    train_crop_model()
-    train_fertilizer_model()
+    main()
@@ -0,0 +1,266 @@
+"""Declarative input validation for the prediction endpoints.
+
+Each endpoint has a schema: an ordered list of fields with a dtype, optional
+bounds and the message shown when a bound is violated. The same schema drives
+the single-record path (a short loop that stops at the first problem) and the
+batch path (NumPy masks over whole columns that report every violation with
+its row index).
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# kind is 'number' or 'category'; message may use {value}
+Field = namedtuple('Field', 'name kind low high message')
+Field.__new__.__defaults__ = (None, None, None)
+
+Violation = namedtuple('Violation', 'row field error')
+
+
+class ValidationError(ValueError):
+    def __init__(self, message, field=None):
+        super().__init__(message)
+        self.field = field
+
+
+TEMPERATURE_MESSAGE = "🌡️ Temperature {value}°C is too extreme for agriculture! Most crops die above 50°C."
+HUMIDITY_MESSAGE = "💧 Humidity {value}% is physically impossible. It must be between 0% and 100%."
+NOT_AN_OBJECT = "Each record must be a JSON object."
+
+# Batches up to this size are checked record by record; larger ones with column masks
+SMALL_BATCH_ROWS = 16
+
+# Fields are checked in list order, which is the order errors are reported in
+CROP_SCHEMA = [
+    Field('temperature', 'number', -10, 60, TEMPERATURE_MESSAGE),
+    Field('humidity', 'number', 0, 100, HUMIDITY_MESSAGE),
+    Field('ph', 'number', 0, 14, "🧪 pH {value} is chemically impossible! The scale ranges from 0 to 14."),
+    Field('N', 'number', high=200, message="⚠️ Nitrogen levels over 200 are toxic to most plants."),
+    Field('P', 'number', high=200, message="⚠️ Phosphorous levels over 200 can lock up other nutrients."),
+    Field('K', 'number', high=250, message="⚠️ Potassium levels over 250 are unusually high."),
+    Field('rainfall', 'number', low=0, message="☔ Rainfall cannot be negative. Are you in a reverse dimension?"),
+]
+
+FERTILIZER_SCHEMA = [
+    Field('Temperature', 'number', -10, 60, TEMPERATURE_MESSAGE),
+    Field('Humidity', 'number', 0, 100, HUMIDITY_MESSAGE),
+    Field('Nitrogen', 'number', high=200, message="⚠️ Soil Nitrogen is already dangerously high."),
+    Field('Moisture', 'number', low=0, message="💧 Moisture cannot be negative."),
+    Field('Soil Type', 'category'),
+    Field('Crop Type', 'category'),
+    Field('Potassium', 'number'),
+    Field('Phosphorous', 'number'),
+]
+
+
+def missing_message(name):
+    return f"Missing required field: {name}"
+
+
+def number_message(name, value):
+    return f"{name} must be a finite number, got {value!r}"
+
+
+def category_message(name, value, allowed=None):
+    if allowed is None:
+        return f"Unknown {name}: {value!r}"
+    return f"Unknown {name}: {value!r}. Valid values: {', '.join(allowed)}."
+
+
+def _allowed(choices, name):
+    # Valid values to quote in the error; choices may be plain collections or encoders.CategoryLookup
+    return sorted(choices[name]) if choices and name in choices else None
+
+
+def _known(choice, column):
+    # CategoryLookup matches case- and whitespace-insensitively; plain collections match exactly
+    if hasattr(choice, 'known_mask'):
+        return choice.known_mask(column.to_numpy())
+    return column.isin(choice).to_numpy()
+
+
+def _native(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_))
+
+
+def _to_float(value):
+    # JSON integers are unbounded; one too large for a float counts as infinite (and so is rejected)
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf
+
+
+def _overflow_as_inf(data):
+    return {name: _to_float(value) if isinstance(value, int) and not isinstance(value, bool) else value
+            for name, value in data.items()}
+
+
+def record_violations(schema, data, choices=None):
+    # Every (field, message) problem of a single record, in schema order
+    if not isinstance(data, dict):
+        return [(None, NOT_AN_OBJECT)]
+    violations = []
+    for field in schema:
+        value = data.get(field.name)
+        if _is_missing(value):
+            violations.append((field.name, missing_message(field.name)))
+        elif field.kind == 'number':
+            if not _is_number(value) or not math.isfinite(_to_float(value)):
+                violations.append((field.name, number_message(field.name, value)))
+            elif (field.low is not None and value < field.low) or (field.high is not None and value > field.high):
+                violations.append((field.name, field.message.format(value=value)))
+        elif not isinstance(value, str) or (choices and field.name in choices and value not in choices[field.name]):
+            violations.append((field.name, category_message(field.name, value, _allowed(choices, field.name))))
+    return violations
+
+
+def validate_record(schema, data, choices=None):
+    violations = record_violations(schema, data, choices)
+    if violations:
+        field, message = violations[0]
+        raise ValidationError(message, field)
+
+
+def bounds_mask(schema, columns, matrix):
+    # Rows of a numeric matrix (one column per name in columns) that are finite and within every bound
+    valid = np.isfinite(matrix).all(axis=1)
+    for field in schema:
+        if field.kind != 'number' or field.name not in columns:
+            continue
+        values = matrix[:, columns.index(field.name)]
+        if field.low is not None:
+            valid &= values >= field.low
+        if field.high is not None:
+            valid &= values <= field.high
+    return valid
+
+
+def coerce_numbers(schema, frame):
+    """Parse the numeric schema columns of a frame read from CSV/Parquet text, cell by cell.
+
+    One unparseable cell makes pandas read its whole column as strings; here only
+    the cells that fail to parse keep their original text (and are then reported
+    as type errors), the rest become numbers. Returns a new frame.
+    """
+    frame = frame.copy()
+    for field in schema:
+        if field.kind != 'number' or field.name not in frame.columns:
+            continue
+        column = frame[field.name]
+        if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            continue
+        numbers = pd.to_numeric(column, errors='coerce')
+        failed = (numbers.isna() & column.notna()).to_numpy()
+        frame[field.name] = numbers.astype(object).where(~failed, column) if failed.any() else numbers
+    return frame
+
+
+def validate_frame(schema, frame, choices=None, records=None):
+    """Check every row of a DataFrame at once.
+
+    Returns (valid, violations): a boolean mask over the rows and a list of
+    Violation(row, field, error) ordered by row, then by schema order. When the
+    frame was built from `records`, messages quote the original values.
+    """
+    n_rows = len(frame)
+    valid = np.ones(n_rows, dtype=bool)
+    found = []
+
+    for rank, field in enumerate(schema):
+        name = field.name
+        if name in frame.columns:
+            column = frame[name]
+        else:
+            column = pd.Series([None] * n_rows, index=frame.index, dtype=object)
+        raw = column.to_numpy()
+        missing = column.isna().to_numpy()
+
+        def value_at(row):
+            return records[row][name] if records is not None else _native(raw[row])
+
+        if field.kind == 'number':
+            if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+                numbers = column.to_numpy(dtype=float)
+                bad_type = np.isinf(numbers)
+            else:
+                # Mixed column: fall back to a per-value type check
+                is_number = np.fromiter((_is_number(v) for v in raw), dtype=bool, count=n_rows)
+                try:
+                    numbers = pd.to_numeric(column.where(is_number), errors='coerce').to_numpy(dtype=float)
+                except OverflowError:
+                    numbers = np.array([_to_float(v) if ok else np.nan for v, ok in zip(raw, is_number)], dtype=float)
+                bad_type = (~is_number & ~missing) | np.isinf(numbers)
+            checked = ~missing & ~bad_type
+            with np.errstate(invalid='ignore'):
+                out_of_bounds = np.zeros(n_rows, dtype=bool)
+                if field.low is not None:
+                    out_of_bounds |= numbers < field.low
+                if field.high is not None:
+                    out_of_bounds |= numbers > field.high
+            out_of_bounds &= checked
+
+            found += [(row, rank, name, number_message(name, value_at(row))) for row in np.flatnonzero(bad_type)]
+            found += [(row, rank, name, field.message.format(value=value_at(row)))
+                      for row in np.flatnonzero(out_of_bounds)]
+            invalid = missing | bad_type | out_of_bounds
+        else:
+            is_str = np.fromiter((isinstance(v, str) for v in raw), dtype=bool, count=n_rows)
+            known = is_str
+            if choices and name in choices:
+                known = is_str & _known(choices[name], column.where(is_str))
+            unknown = ~missing & ~known
+            allowed = _allowed(choices, name)
+            found += [(row, rank, name, category_message(name, value_at(row), allowed)) for row in np.flatnonzero(unknown)]
+            invalid = missing | unknown
+
+        found += [(row, rank, name, missing_message(name)) for row in np.flatnonzero(missing)]
+        valid &= ~invalid
+
+    found.sort(key=lambda v: (v[0], v[1]))
+    return valid, [Violation(int(row), name, error) for row, _, name, error in found]
+
+
+def validate_records(schema, records, choices=None):
+    # Returns (frame, valid, violations) for a list of JSON records
+    not_objects = [i for i, data in enumerate(records) if not isinstance(data, dict)]
+    rows = [data if isinstance(data, dict) else {} for data in records] if not_objects else records
+    columns = [field.name for field in schema]
+    try:
+        frame = pd.DataFrame.from_records(rows, columns=columns)
+    except OverflowError:
+        # An int too large for a float; messages still quote the original record
+        frame = pd.DataFrame.from_records([_overflow_as_inf(data) for data in rows], columns=columns)
+    frame.index = range(len(rows))
+    valid, violations = validate_frame(schema, frame, choices, rows)
+    if not_objects:
+        valid[not_objects] = False
+        skipped = set(not_objects)
+        violations = [v for v in violations if v.row not in skipped]
+        violations += [Violation(i, None, NOT_AN_OBJECT) for i in not_objects]
+        violations.sort(key=lambda v: v.row)
+    return frame, valid, violations
+
+
+def check_records(schema, records, choices=None):
+    # (valid mask, violations) for a batch; tiny batches skip the DataFrame round trip
+    if len(records) > SMALL_BATCH_ROWS:
+        _, valid, violations = validate_records(schema, records, choices)
+        return valid, violations
+    valid = np.ones(len(records), dtype=bool)
+    violations = []
+    for row, data in enumerate(records):
+        for name, error in record_violations(schema, data, choices):
+            violations.append(Violation(row, name, error))
+            valid[row] = False
+    return valid, violations